@@ -0,0 +1,109 @@
+"""
+Benchmark of the record level delta (delta.py) against a full conversion of
+the new export. Applying the patch to the conversion of the old export must
+give the conversion of the new export, also when a record corrects the
+fields of an address that only it mentions, moves to another address,
+or is deleted.
+
+Run from the root of the repository:
+
+    python -m benchmarks.bench_delta [n]
+"""
+
+import os
+import re
+import sys
+import time
+import tempfile
+
+import main
+from delta import delta
+from benchmarks.synthetic import writeExport
+
+INDEX = 'SAA_Index_op_bevolkingsregister_1851-1853'
+
+
+def edit(xml, i, **fields):
+    """Set fields of the record with @id `i` (None to drop the record)."""
+    pattern = re.compile(rf'<indexRecord id="{i}">.*?</indexRecord>\n', re.S)
+
+    def replace(match):
+        if fields.get('drop'):
+            return ''
+
+        block = match.group(0)
+        for field, value in fields.items():
+            block = re.sub(rf'<{field}>.*?</{field}>',
+                           f'<{field}>{value}</{field}>', block)
+        return block
+
+    return pattern.sub(replace, xml)
+
+
+def quads(trigfolder):
+    """The quads of a conversion, without the conversion dates."""
+    lines = set()
+    for root, dirs, files in os.walk(trigfolder):
+        for f in files:
+            if f.endswith('.nq'):
+                with open(os.path.join(root, f), encoding='utf-8') as infile:
+                    lines.update(line for line in infile
+                                 if 'dcterms/modified' not in line)
+
+    return lines
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exports = {}
+        for version in ['old', 'new']:
+            os.makedirs(os.path.join(tmp, version, 'data', INDEX))
+            exports[version] = os.path.join(tmp, version, 'data', INDEX,
+                                            'export.xml')
+
+        writeExport(exports['old'], n)
+        with open(exports['old'], encoding='utf-8') as infile:
+            xml = infile.read()
+
+        # Addresses that only one record mentions
+        xml = edit(xml, 'saaId5', adres='Teststraat 1', buurtcode='D')
+        xml = edit(xml, 'saaId6', adres='Teststraat 2')
+        with open(exports['old'], 'w', encoding='utf-8') as outfile:
+            outfile.write(xml)
+
+        # A corrected buurtcode, a move, a deleted and an added record
+        xml = edit(xml, 'saaId5', buurtcode='A')
+        xml = edit(xml, 'saaId6', adres='Teststraat 3')
+        xml = edit(xml, 'saaId7', drop=True)
+        xml = xml.replace(
+            '</indexRecords>',
+            '<indexRecord id="saaIdNew"><adres>Teststraat 4</adres>'
+            '<buurtcode>B</buurtcode></indexRecord>\n</indexRecords>')
+        with open(exports['new'], 'w', encoding='utf-8') as outfile:
+            outfile.write(xml)
+
+        converted = {}
+        for version in ['old', 'new']:
+            trigfolder = os.path.join(tmp, version, 'trig')
+            main.xml2rdf(os.path.join(tmp, version, 'data'),
+                         trigfolder,
+                         emitter='triples',
+                         outputformat='nquads')
+            converted[version] = quads(trigfolder)
+
+        target = os.path.join(tmp, 'patch')
+        t0 = time.perf_counter()
+        delta(exports['old'], exports['new'], target)
+        print(f"delta        {time.perf_counter() - t0:7.3f}s")
+
+        with open(target + '.delete.nq', encoding='utf-8') as infile:
+            deletes = set(infile)
+        with open(target + '.add.nq', encoding='utf-8') as infile:
+            adds = set(infile)
+
+        patched = (converted['old'] - deletes) | adds
+        assert patched == converted['new'], (
+            f"{len(patched - converted['new'])} quads too many, "
+            f"{len(converted['new'] - patched)} missing after the patch")
@@ -0,0 +1,60 @@
+"""
+Benchmark of the derived values of the records (the address, the name and
+the IRIs of the shared resources): row by row (emitter.derive) against per
+column on the batches of the columnar cache (columnar.derivebatch). Both
+must give the same values, also for records without (parts of) a name.
+
+Run from the root of the repository:
+
+    python -m benchmarks.bench_derive [n]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+import main
+from emitter import derive
+from columnar import xml2parquet, iterparquet, iterbatches, derivebatch
+from benchmarks.synthetic import writeExport
+
+INDEX = 'SAA_Index_op_bevolkingsregister_1851-1853'
+
+
+def context():
+    return main.IndexContext(INDEX, main.BUURT2ADAMLINK,
+                             main.OCCUPATIONS2HISCO, main.OCCUPATIONMATCHER)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    main.loadLookups()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xmlfile = os.path.join(tmp, 'export.xml')
+        parquetfile = os.path.join(tmp, 'export.parquet')
+        writeExport(xmlfile, n)
+        xml2parquet(xmlfile, parquetfile)
+
+        records = list(iterparquet(parquetfile))
+        print(f"{len(records)} records")
+
+        # A fresh context each, so that both mint the IRIs
+        rowcontext = context()
+        t0 = time.perf_counter()
+        rows = [derive(record, rowcontext) for record in records]
+        print(f"derive       {time.perf_counter() - t0:7.3f}s")
+
+        batchcontext = context()
+        t0 = time.perf_counter()
+        batches = [
+            derived for batch in iterbatches(parquetfile)
+            for derived in derivebatch(batch, batchcontext)
+        ]
+        print(f"derivebatch  {time.perf_counter() - t0:7.3f}s")
+
+        assert len(rows) == len(batches), "derivebatch dropped records"
+        for record, row, batch in zip(records, rows, batches):
+            assert row == batch, f"{record['@id']}: {row} != {batch}"
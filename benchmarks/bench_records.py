@@ -0,0 +1,94 @@
+"""
+Benchmark of the Record view against the recursive `defaultify` copy that
+parsexml used before.
+
+Run from the root of the repository:
+
+    python -m benchmarks.bench_records [n]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+
+from collections import defaultdict
+
+from records import iterrecords, element2dict, Record, RECORDTAG
+from benchmarks.synthetic import writeExport
+
+import xml.etree.ElementTree as ET
+
+FIELDS = [
+    '@id', 'inventarisnummer', 'adres', 'straatnaam', 'straatnaamInBron',
+    'buurtcode', 'buurtnummer', 'straatMetKleinnummer', 'huisnummertoevoeging',
+    'beroep', 'overigeGegevens', 'geboorteplaats', 'geboortedatum', 'urlScan'
+]
+
+
+def defaultify(d, defaultdict_type=None):
+    """The previous implementation (main.py), kept here as baseline."""
+    if isinstance(d, dict):
+        return defaultdict(lambda: defaultdict_type,
+                           {k: defaultify(v)
+                            for k, v in d.items()})
+    elif isinstance(d, list):
+        return [defaultify(i) for i in d]
+    else:
+        return d
+
+
+def readRecords(xmlfile):
+    """Parse all records as plain dicts, so that only the wrapping differs."""
+    return [
+        element2dict(element) for _, element in ET.iterparse(xmlfile)
+        if element.tag == RECORDTAG
+    ]
+
+
+def access(record):
+    """The field access pattern of the mapping loop in parsexml."""
+    for field in FIELDS:
+        record[field]
+
+    naam = record['naam']
+    if naam is not None:
+        naam['voornaam'], naam['tussenvoegsel'], naam['achternaam']
+
+
+def bench(label, wrap, dicts):
+    t0 = time.perf_counter()
+    for d in dicts:
+        access(wrap(d))
+    seconds = time.perf_counter() - t0
+
+    # Memory that the wrapped records keep alive on top of the parsed dicts
+    tracemalloc.start()
+    wrapped = [wrap(d) for d in dicts]
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del wrapped
+
+    print(f"{label:<12} wrap+access {seconds:7.3f}s  "
+          f"retained {retained / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xmlfile = os.path.join(tmp, 'export.xml')
+        writeExport(xmlfile, n)
+
+        dicts = readRecords(xmlfile)
+        print(f"{len(dicts)} records")
+
+        bench('defaultify', defaultify, dicts)
+        bench('Record', Record, dicts)
+
+        # And the whole ingest as parsexml does it now
+        t0 = time.perf_counter()
+        for record in iterrecords(xmlfile):
+            access(record)
+        print(f"iterrecords  parse+access {time.perf_counter() - t0:7.3f}s")
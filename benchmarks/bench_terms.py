@@ -0,0 +1,69 @@
+"""
+Benchmark of the interned terms (terms.TERMS): memory of the rdflib graph
+with the triples of the direct emitter, with and without interning.
+
+Run from the root of the repository:
+
+    python -m benchmarks.bench_terms [n]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+
+from rdflib import Graph
+
+import main
+from terms import TERMS
+from emitter import emitRecord
+from records import iterrecords
+from benchmarks.synthetic import writeExport
+
+INDEX = 'SAA_Index_op_bevolkingsregister_1851-1853'
+
+
+def bench(xmlfile, intern):
+    TERMS.intern = intern
+    TERMS.terms.clear()
+    TERMS.hits = TERMS.saved = 0
+
+    main.loadLookups()
+    context = main.IndexContext(INDEX, main.BUURT2ADAMLINK,
+                                main.OCCUPATIONS2HISCO,
+                                main.OCCUPATIONMATCHER)
+
+    records = list(iterrecords(xmlfile))
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+
+    g = Graph(identifier=context.dataset)
+    for record in records:
+        g.addN((s, p, o, g) for s, p, o in emitRecord(record, context))
+
+    seconds = time.perf_counter() - t0
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    terms, hits, saved = TERMS.stats()
+    print(f"intern={intern!s:<5} {len(g)} triples in {seconds:6.2f}s  "
+          f"graph {size / 2**20:7.1f} MiB  ({hits} hits, "
+          f"{saved / 2**20:.1f} MiB estimated saved)")
+
+    return size
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xmlfile = os.path.join(tmp, 'export.xml')
+        writeExport(xmlfile, n)
+
+        without = bench(xmlfile, intern=False)
+        interned = bench(xmlfile, intern=True)
+
+        print(f"Saved: {(without - interned) / 2**20:.1f} MiB "
+              f"({(without - interned) / without:.1%})")
@@ -0,0 +1,75 @@
+"""
+Synthetic SAA export for the benchmarks. The records follow the structure of
+the bevolkingsregister indices, with the repetition of places, addresses and
+occupations that the real exports have.
+"""
+
+import random
+
+PLACES = ['Amsterdam', 'Haarlem', 'Utrecht', 'Leiden', 'Zaandam', None]
+OCCUPATIONS = [
+    'nachtwacht', 'boekhouder', 'koopman en winkelier', 'slager',
+    'conducteur en tapper', '[kookster]', 'onderwijzer', 'sjouwer aan de stad',
+    None
+]
+STREETS = ['Kalverstraat', 'Nieuwendijk', 'Prinsengracht', 'Jodenbreestraat']
+
+
+def writeExport(path, n, seed=1851):
+    """Write an xml file with `n` indexRecords to `path`.
+
+    Args:
+        path (str): Destination file
+        n (int): Number of records
+        seed (int, optional): Seed for the random generator. Defaults to 1851.
+    """
+    rnd = random.Random(seed)
+
+    with open(path, 'w', encoding='utf-8') as outfile:
+        outfile.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n<indexRecords>\n')
+
+        for i in range(n):
+            street = rnd.choice(STREETS)
+            number = rnd.randint(1, 400)
+            place = rnd.choice(PLACES)
+            occupation = rnd.choice(OCCUPATIONS)
+
+            outfile.write(f'<indexRecord id="saaId{i}">\n')
+            outfile.write(f'<inventarisnummer>{i % 700}</inventarisnummer>\n')
+            # Some records have no name, or only the uuid of one
+            if i % 100 != 99:
+                outfile.write('<naam>\n')
+            if i % 100 < 98:
+                outfile.write(
+                    f'<voornaam>Voornaam{rnd.randint(1, 500)}</voornaam>\n')
+                if rnd.random() < 0.2:
+                    outfile.write('<tussenvoegsel>van</tussenvoegsel>\n')
+                outfile.write(
+                    f'<achternaam>Achternaam{rnd.randint(1, 5000)}</achternaam>\n'
+                )
+            if i % 100 != 99:
+                outfile.write(
+                    f'<uuidNaam>{rnd.getrandbits(128):032x}</uuidNaam>\n')
+                outfile.write('</naam>\n')
+            if place:
+                outfile.write(f'<geboorteplaats>{place}</geboorteplaats>\n')
+            outfile.write(
+                f'<geboortedatum>18{rnd.randint(10, 50)}-0{rnd.randint(1, 9)}-1{rnd.randint(0, 9)}</geboortedatum>\n'
+            )
+            outfile.write(f'<adres>{street} {number}</adres>\n')
+            if rnd.random() < 0.1:
+                outfile.write(
+                    '<huisnummertoevoeging>A</huisnummertoevoeging>\n')
+            outfile.write(f'<straatnaam>{street}</straatnaam>\n')
+            outfile.write(f'<buurtcode>{rnd.choice("ABCD")}</buurtcode>\n')
+            outfile.write(f'<buurtnummer>{number}</buurtnummer>\n')
+            if occupation:
+                outfile.write(f'<beroep>{occupation}</beroep>\n')
+            for s in range(rnd.randint(1, 2)):
+                outfile.write(
+                    f'<urlScan>https://archief.amsterdam/scan/{i}_{s}.jpg</urlScan>\n'
+                )
+            outfile.write('</indexRecord>\n')
+
+        outfile.write('</indexRecords>\n')
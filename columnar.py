@@ -0,0 +1,294 @@
+"""
+Columnar cache of the parsed records of a SAA export (Parquet, needs
+pyarrow).
+
+Parsing the xml is the slowest stage of a conversion. An export is parsed
+once into a Parquet file with a column per field that the mapping uses, and
+the records are read back from the (memory mapped) cache on the next runs.
+The name is a struct column (naam.voornaam, naam.achternaam, ...), the scans
+are a list column. The size and sha256 of the xml are kept in the schema
+metadata: the cache is only used for the content that it was made from.
+
+On a batch of records from the cache, the values that the mapping derives
+from the fields (see emitter.derive) are computed per column, with the IRIs
+minted once per distinct value.
+"""
+
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+from rdflib import XSD
+
+from records import Record, iterrecords
+from manifest import filehash
+from terms import TERMS
+
+FIELDS = [
+    '@id', 'inventarisnummer', 'geboorteplaats', 'geboortedatum', 'adres',
+    'huisnummertoevoeging', 'straatnaam', 'straatnaamInBron',
+    'straatMetKleinnummer', 'buurtcode', 'buurtnummer', 'beroep',
+    'overigeGegevens'
+]
+NAMEFIELDS = ['voornaam', 'tussenvoegsel', 'achternaam', 'uuidNaam']
+
+# Placeholder for a missing name part in derivebatch
+MISSING = "\x00"
+
+
+def schema():
+    """The Arrow schema of the cache."""
+    if pa is None:
+        raise ImportError("The columnar cache needs the pyarrow package")
+
+    return pa.schema([(field, pa.string()) for field in FIELDS] + [
+        ('naam', pa.struct([(field, pa.string()) for field in NAMEFIELDS])),
+        ('urlScan', pa.list_(pa.string()))
+    ])
+
+
+def row(record):
+    """The cached fields of a record.
+
+    Args:
+        record (Record): The record
+
+    Returns:
+        dict: field: value
+    """
+    d = {field: record[field] for field in FIELDS}
+
+    naam = record['naam']
+    d['naam'] = {field: naam[field]
+                 for field in NAMEFIELDS} if naam is not None else None
+
+    urlScan = record['urlScan']
+    if urlScan is None or isinstance(urlScan, list):
+        d['urlScan'] = urlScan
+    else:
+        d['urlScan'] = [urlScan]
+
+    return d
+
+
+def record(d):
+    """A Record in the xmltodict structure from a cached row. Missing values
+    are left out, a single scan is a string.
+
+    Args:
+        d (dict): field: value
+
+    Returns:
+        Record: The record
+    """
+    data = {field: d[field] for field in FIELDS if d[field] is not None}
+
+    if d['naam'] is not None:
+        data['naam'] = {k: v for k, v in d['naam'].items() if v is not None}
+
+    urlScan = d['urlScan']
+    if urlScan:
+        data['urlScan'] = urlScan[0] if len(urlScan) == 1 else urlScan
+
+    return Record(data)
+
+
+def xml2parquet(xmlfile, parquetfile, batchsize=10000, fingerprint=None):
+    """Parse an export into the columnar cache. The file is replaced
+    atomically.
+
+    Args:
+        xmlfile (str): Path to the xml file
+        parquetfile (str): Destination
+        batchsize (int, optional): Records per row group. Defaults to 10000.
+        fingerprint (dict, optional): Size and hash of the xml file (see
+        manifest.Manifest.fingerprint), kept with the cache. Defaults to None
+        (computed here).
+
+    Returns:
+        int: Number of records
+    """
+    if fingerprint is None:
+        fingerprint = {
+            'size': os.path.getsize(xmlfile),
+            'hash': filehash(xmlfile)
+        }
+
+    s = schema().with_metadata({
+        'size': str(fingerprint['size']),
+        'sha256': fingerprint['hash']
+    })
+
+    os.makedirs(os.path.dirname(os.path.abspath(parquetfile)), exist_ok=True)
+    tmpfile = parquetfile + '.tmp'
+
+    n = 0
+    rows = []
+    with open(xmlfile, 'rb') as infile, pq.ParquetWriter(tmpfile,
+                                                          s) as writer:
+        for r in iterrecords(infile):
+            rows.append(row(r))
+            n += 1
+
+            if len(rows) >= batchsize:
+                writer.write_table(pa.Table.from_pylist(rows, schema=s))
+                rows = []
+
+        if rows:
+            writer.write_table(pa.Table.from_pylist(rows, schema=s))
+
+    os.replace(tmpfile, parquetfile)
+
+    return n
+
+
+def iterbatches(parquetfile, batchsize=10000):
+    """Iterate over the cache in Arrow record batches.
+
+    Args:
+        parquetfile (str): The cache
+        batchsize (int, optional): Records per batch. Defaults to 10000.
+
+    Yields:
+        RecordBatch: A batch of records
+    """
+    if pq is None:
+        raise ImportError("The columnar cache needs the pyarrow package")
+
+    yield from pq.ParquetFile(parquetfile,
+                              memory_map=True).iter_batches(batchsize)
+
+
+def iterparquet(parquetfile, batchsize=10000):
+    """Iterate over the records in the cache, like `records.iterrecords`.
+
+    Args:
+        parquetfile (str): The cache
+        batchsize (int, optional): Records read at once. Defaults to 10000.
+
+    Yields:
+        Record: One record in the xmltodict structure
+    """
+    for batch in iterbatches(parquetfile, batchsize):
+        for d in batch.to_pylist():
+            yield record(d)
+
+
+def factorize(column, f):
+    """Apply a function once per distinct value of a column.
+
+    Args:
+        column (Array): The column
+        f (callable): Called with every distinct (non-null) value
+
+    Returns:
+        list: The result per row (None for null)
+    """
+    encoded = pc.dictionary_encode(column)
+    values = [f(value) for value in encoded.dictionary.to_pylist()]
+
+    return [
+        values[i] if i is not None else None
+        for i in encoded.indices.to_pylist()
+    ]
+
+
+def derivebatch(batch, context):
+    """The derived values of a batch of records, like `emitter.derive`.
+
+    Args:
+        batch (RecordBatch): Records from the cache
+        context (IndexContext): Everything that is shared by the records of
+        the index
+
+    Returns:
+        list: dict of derived values per record
+    """
+    column = batch.column
+
+    # straatMetKleinnummer or disambiguatingAddress or adres or ...
+    disambiguatingAddress = pc.binary_join_element_wise(
+        column('adres'), column('huisnummertoevoeging'), " ")
+    address = pc.coalesce(column('straatMetKleinnummer'),
+                          disambiguatingAddress, column('adres'),
+                          column('straatnaamInBron'), column('buurtnummer'))
+
+    # The name parts that are present, joined. null_handling='skip' drops
+    # the rows in which all parts are null (e.g. a naam with only a
+    # uuidNaam), so the missing parts are joined as NUL (which cannot occur
+    # in xml) and taken out again.
+    naam = column('naam')
+    joined = pc.binary_join_element_wise(pc.struct_field(naam, 'voornaam'),
+                                         pc.struct_field(naam, 'tussenvoegsel'),
+                                         pc.struct_field(naam, 'achternaam'),
+                                         " ",
+                                         null_handling='replace',
+                                         null_replacement=MISSING)
+    for pattern in [MISSING + " ", " " + MISSING, MISSING]:
+        joined = pc.replace_substring(joined, pattern, "")
+
+    literalName = pc.if_else(pc.is_valid(naam), joined, None)
+
+    columns = {
+        'place':
+        factorize(column('geboorteplaats'), context.location),
+        'birthDate':
+        factorize(column('geboortedatum'),
+                  lambda v: TERMS.literal(v, datatype=XSD.datetime)),
+        'address':
+        address.to_pylist(),
+        'loc':
+        factorize(address, context.location),
+        'postalAddress':
+        factorize(address, context.address),
+        'literalName':
+        literalName.to_pylist(),
+        'occupation':
+        factorize(column('beroep'), context.occupation)
+    }
+
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def iterderived(parquetfile, context, batchsize=10000):
+    """Iterate over the records in the cache with their derived values.
+
+    Args:
+        parquetfile (str): The cache
+        context (IndexContext): Everything that is shared by the records of
+        the index
+        batchsize (int, optional): Records read at once. Defaults to 10000.
+
+    Yields:
+        tuple: Record and its derived values (dict)
+    """
+    for batch in iterbatches(parquetfile, batchsize):
+        yield from zip(map(record, batch.to_pylist()),
+                       derivebatch(batch, context))
+
+
+def cached(parquetfile, fingerprint):
+    """Whether the cache of an export is up to date. Modification times are
+    not to be trusted (e.g. unzip keeps those of the archive), so the size
+    and hash of the xml file are compared.
+
+    Args:
+        parquetfile (str): The cache
+        fingerprint (dict): Size and hash of the xml file (see
+        manifest.Manifest.fingerprint)
+
+    Returns:
+        bool: True if the cache was made from the same content
+    """
+    if not os.path.exists(parquetfile):
+        return False
+
+    metadata = pq.read_schema(parquetfile).metadata or {}
+
+    return (metadata.get(b'size') == str(fingerprint['size']).encode()
+            and metadata.get(b'sha256') == fingerprint['hash'].encode())
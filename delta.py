@@ -0,0 +1,219 @@
+"""
+Record level delta between two exports of the same index.
+
+The records of the old and the new export are matched on their @id and
+compared on a content hash. Only the records that were added, deleted or
+changed are converted. The result is a patch of two N-Quads files:
+
+    <target>.delete.nq  the triples of the deleted and changed records
+    <target>.add.nq     the triples of the added and changed records
+
+Apply the deletes before the adds. The delete holds the triples that
+belong to the deleted and changed records: those of the resources that are
+minted on their @id (see emitter.recordResources) and the links to them
+from shared resources, e.g. the documentedIn of a location.
+
+The shared resources (locations, addresses, occupations) are described from
+all records that mention them, e.g. an address gets the buurtcode of every
+variant of its fields. For every shared resource that a deleted or changed
+record mentions, the description in the old export is compared with the one
+in the new export, and what no longer holds is deleted as well: a corrected
+buurtcode, or an address that no record mentions any more.
+
+Usage:
+    python delta.py old.xml new.xml target [--compression gzip|zstd]
+        [--fuzzy [THRESHOLD]]
+"""
+
+import os
+import argparse
+
+import main
+from main import IndexContext, loadLookups
+from records import iterrecords, recordhash
+from emitter import emitRecord, recordResources
+from writers import NQuadsWriter, COMPRESSIONS
+from occupations import THRESHOLD
+
+
+def recordhashes(xmlfile):
+    """The content hash of every record in an export.
+
+    Args:
+        xmlfile (str): Path to the xml file
+
+    Returns:
+        dict: @id: hash
+    """
+    with open(xmlfile, 'rb') as infile:
+        return {
+            record['@id']: recordhash(record)
+            for record in iterrecords(infile)
+        }
+
+
+def emitRecords(xmlfile, ids, context, writer, owned=False):
+    """Write the triples of some records of an export.
+
+    Args:
+        xmlfile (str): Path to the xml file
+        ids (set): The @ids of the records
+        context (IndexContext): A fresh context, so that the shared
+        resources are described again
+        writer (NQuadsWriter): Destination
+        owned (bool, optional): Only write the triples that belong to the
+        record. Defaults to False.
+
+    Returns:
+        int: Number of records written
+    """
+    n = 0
+
+    with open(xmlfile, 'rb') as infile:
+        for record in iterrecords(infile):
+            if record['@id'] not in ids:
+                continue
+
+            triples = emitRecord(record, context)
+
+            if owned:
+                resources = recordResources(record)
+                triples = [(s, p, o) for s, p, o in triples
+                           if s in resources or o in resources]
+
+            writer.write(triples, context.dataset)
+            n += 1
+
+    return n
+
+
+def touchedResources(xmlfile, ids, context):
+    """The resources that the triples of some records of an export mention.
+
+    Args:
+        xmlfile (str): Path to the xml file
+        ids (set): The @ids of the records
+        context (IndexContext): A fresh context
+
+    Returns:
+        tuple: The resources that belong to the records and the shared
+        resources that they describe or link (sets)
+    """
+    owned = set()
+    shared = set()
+
+    with open(xmlfile, 'rb') as infile:
+        for record in iterrecords(infile):
+            if record['@id'] not in ids:
+                continue
+
+            resources = recordResources(record)
+            owned |= resources
+            shared.update(s for s, p, o in emitRecord(record, context)
+                          if s not in resources)
+
+    return owned, shared
+
+
+def descriptions(xmlfile, resources, context):
+    """The description of some resources in an export: the triples with the
+    resource as subject, from all records.
+
+    Args:
+        xmlfile (str): Path to the xml file
+        resources (set): The resources
+        context (IndexContext): A fresh context
+
+    Returns:
+        set: The triples
+    """
+    triples = set()
+
+    with open(xmlfile, 'rb') as infile:
+        for record in iterrecords(infile):
+            triples.update(triple for triple in emitRecord(record, context)
+                           if triple[0] in resources)
+
+    return triples
+
+
+def delta(oldfile, newfile, target, compression=None, fuzzy=None):
+    """Write the add and delete patch between two exports of an index.
+
+    Args:
+        oldfile (str): The old export
+        newfile (str): The new export, in the folder of its index
+        target (str): Path of the patch, without extension
+        compression (str, optional): 'gzip' or 'zstd'. Defaults to None.
+        fuzzy (float, optional): Threshold of the fuzzy matching of the
+        occupations, as in the conversion. Defaults to None (exact matches
+        only).
+
+    Returns:
+        tuple: Number of added, deleted and changed records
+    """
+    indexName = os.path.basename(os.path.dirname(os.path.abspath(newfile)))
+
+    old = recordhashes(oldfile)
+    new = recordhashes(newfile)
+
+    added = new.keys() - old.keys()
+    deleted = old.keys() - new.keys()
+    changed = {i for i in old.keys() & new.keys() if old[i] != new[i]}
+
+    print(f"{len(added)} added, {len(deleted)} deleted and {len(changed)} "
+          f"changed records of {len(new)}")
+
+    loadLookups(fuzzy)
+
+    def context():
+        return IndexContext(
+            indexName, main.BUURT2ADAMLINK, main.OCCUPATIONS2HISCO,
+            main.OCCUPATIONMATCHER if fuzzy is not None else None)
+
+    extension = '.nq' + COMPRESSIONS.get(compression, '')
+
+    with NQuadsWriter(f"{target}.delete{extension}") as writer:
+        oldcontext = context()
+        emitRecords(oldfile, deleted | changed, oldcontext, writer, owned=True)
+
+        # What the new export no longer says about the shared resources of
+        # these records. The links to the records are deleted above already.
+        owned, shared = touchedResources(oldfile, deleted | changed,
+                                         context())
+        stale = descriptions(oldfile, shared, context()) - descriptions(
+            newfile, shared, context())
+
+        writer.write(sorted(t for t in stale if t[2] not in owned),
+                     oldcontext.dataset)
+
+    with NQuadsWriter(f"{target}.add{extension}") as writer:
+        emitRecords(newfile, added | changed, context(), writer)
+
+    return len(added), len(deleted), len(changed)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Write the add and delete patch between two exports of "
+        "the same index.")
+    parser.add_argument('oldfile', help="The old export (xml)")
+    parser.add_argument(
+        'newfile', help="The new export (xml), in the folder of its index")
+    parser.add_argument('target', help="Path of the patch, without extension")
+    parser.add_argument('--compression',
+                        choices=list(COMPRESSIONS),
+                        default=None)
+    parser.add_argument(
+        '--fuzzy',
+        type=float,
+        nargs='?',
+        const=THRESHOLD,
+        default=None,
+        help="Fuzzy match the occupations, as in the conversion (default "
+        f"threshold: {THRESHOLD})")
+    args = parser.parse_args()
+
+    delta(args.oldfile, args.newfile, args.target, args.compression,
+          args.fuzzy)
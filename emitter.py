@@ -0,0 +1,553 @@
+"""
+Direct triple emitter for the SAA indices.
+
+Produces the triples of the object model mapping (`mapRecord` in main.py) as
+plain tuples, without going through the rdfalchemy descriptors that update
+the graph on every attribute assignment. The classes and predicates are read
+from the models in models/saa.py and models/bio.py, so that both ways of
+mapping share the same vocabulary.
+"""
+
+from rdflib import RDF, XSD
+from rdflib import URIRef, Literal
+from rdflib.term import Identifier
+
+from models.bio import Birth, Role, RoleType
+from models.saa import (Document, PersonObservation, PersonName,
+                        LocationObservation, PostalAddress, StructuredValue,
+                        OccupationObservation, CategoryCode, CategoryCodeSet)
+from models.saa import saaRec, saaPersonObservation, saaPersonName
+from models.saa import saaRole, saaBirth, saaStructuredValue
+
+from terms import TERMS
+
+
+class Shape:
+    """The rdf:type(s) and the predicate of every rdfSingle/rdfMultiple
+    attribute of a model class.
+
+    Args:
+        cls (type): rdfSubject subclass from the models
+    """
+
+    def __init__(self, cls):
+
+        rdf_type = cls.rdf_type
+
+        if rdf_type is None:
+            self.types = ()
+        elif isinstance(rdf_type, tuple):
+            self.types = rdf_type
+        else:
+            self.types = (rdf_type, )
+
+        # Read the descriptors from the class dicts, so that their __get__ is
+        # never triggered. Subclasses override their parents.
+        self.predicates = {}
+        for c in reversed(cls.__mro__):
+            for name, attribute in vars(c).items():
+                pred = getattr(attribute, 'pred', None)
+                if pred is not None:
+                    self.predicates[name] = pred
+
+    def __getitem__(self, attribute):
+        return self.predicates[attribute]
+
+
+DOCUMENT = Shape(Document)
+PERSONOBSERVATION = Shape(PersonObservation)
+PERSONNAME = Shape(PersonName)
+LOCATIONOBSERVATION = Shape(LocationObservation)
+POSTALADDRESS = Shape(PostalAddress)
+STRUCTUREDVALUE = Shape(StructuredValue)
+OCCUPATIONOBSERVATION = Shape(OccupationObservation)
+CATEGORYCODE = Shape(CategoryCode)
+CATEGORYCODESET = Shape(CategoryCodeSet)
+BIRTH = Shape(Birth)
+ROLE = Shape(Role)
+ROLETYPE = Shape(RoleType)
+
+HISCO = URIRef("https://iisg.amsterdam/resource/hisco/HISCO")
+
+# Compiled occupations, see compileOccupation
+OCCUPATIONS = dict()
+
+
+def term(value):
+    """Turn a value into an rdflib term, like rdfalchemy does on assignment.
+
+    Args:
+        value: URIRef, BNode, Literal or a python value
+
+    Returns:
+        Identifier: The value as rdflib term
+    """
+    if isinstance(value, Identifier):
+        return value
+    return Literal(value)
+
+
+def emit(add, subject, shape, **values):
+    """Emit the triples of one resource, as the constructor of the model
+    class would have added them. Values that are None are skipped and lists
+    give a triple per item.
+
+    Args:
+        add (callable): Called with every triple
+        subject (URIRef or BNode): The resource
+        shape (Shape): The model class of the resource
+        **values: attribute=value pairs, as given to the model class
+    """
+
+    for rdf_type in shape.types:
+        add((subject, RDF.type, rdf_type))
+
+    for attribute, value in values.items():
+        if value is None:
+            continue
+
+        p = shape[attribute]
+
+        if type(value) == list:
+            for v in value:
+                if v is not None:
+                    add((subject, p, term(v)))
+        else:
+            add((subject, p, term(value)))
+
+
+# static
+HISCOTRIPLES = []
+emit(HISCOTRIPLES.append,
+     HISCO,
+     CATEGORYCODESET,
+     label=['HISCO'],
+     name=['HISCO'])
+
+
+def recordResources(record):
+    """The resources that belong to one record only: the IRIs that are minted
+    on its @id (and the PersonName on its uuidNaam). Everything else in the
+    triples of a record (locations, addresses, occupations, HISCO) is shared
+    with other records.
+
+    Args:
+        record (Record): The indexRecord
+
+    Returns:
+        set: URIRefs
+    """
+    i = record['@id']
+
+    resources = {
+        saaRec.term(i),
+        saaPersonObservation.term(i),
+        saaPersonName.term(i),
+        saaBirth.term(i),
+        saaStructuredValue.term(f"{i}/birthplace"),
+        saaStructuredValue.term(f"{i}/resident"),
+        saaStructuredValue.term(f"{i}/homelocation"),
+        saaRole.term(f"{i}/born")
+    }
+
+    if record['naam'] is not None and record['naam'].get('uuidNaam'):
+        resources.add(saaPersonName.term(record['naam']['uuidNaam']))
+
+    return resources
+
+
+def derive(record, context):
+    """The values that the mapping derives from the fields of a record: the
+    address, the name and the IRIs of the shared resources. See
+    `columnar.derivebatch` for the same on a whole batch of records.
+
+    Args:
+        record (Record): The indexRecord
+        context (IndexContext): Everything that is shared by the records of
+        the index
+
+    Returns:
+        dict: place, birthDate, address, loc, postalAddress, literalName and
+        occupation (None if not applicable)
+    """
+
+    # need a unique entry for the adres
+    if record['huisnummertoevoeging'] and record['adres']:
+        disambiguatingAddress = f"{record['adres']} {record['huisnummertoevoeging']}"
+    else:
+        disambiguatingAddress = None
+
+    address = record['straatMetKleinnummer'] or disambiguatingAddress or record[
+        'adres'] or record['straatnaamInBron'] or record['buurtnummer']
+
+    personname = record['naam']
+    if personname is not None:
+        literalName = " ".join([
+            i for i in [
+                personname['voornaam'], personname['tussenvoegsel'],
+                personname['achternaam']
+            ] if i is not None
+        ])
+    else:
+        literalName = None
+
+    return {
+        'place':
+        context.location(record['geboorteplaats'])
+        if record['geboorteplaats'] else None,
+        'birthDate':
+        TERMS.literal(record['geboortedatum'], datatype=XSD.datetime)
+        if record['geboortedatum'] is not None else None,
+        'address':
+        address,
+        'loc':
+        context.location(address) if address else None,
+        'postalAddress':
+        context.address(address) if address else None,
+        'literalName':
+        literalName,
+        'occupation':
+        context.occupation(record['beroep']) if record['beroep'] else None
+    }
+
+
+def emitRecord(record, context, derived=None):
+    """Map a SAA indexRecord to a list of triples.
+
+    Args:
+        record (Record): The indexRecord
+        context (IndexContext): Everything that is shared by the records of
+        the index
+        derived (dict, optional): The derived values of the record. Defaults
+        to None (computed with `derive`).
+
+    Returns:
+        list: The triples of the record
+    """
+
+    if derived is None:
+        derived = derive(record, context)
+
+    triples = []
+    add = triples.append
+
+    dataset = context.dataset
+
+    r = saaRec.term(record['@id'])
+
+    emit(add,
+         r,
+         DOCUMENT,
+         identifier=record['@id'],
+         inventoryNumber=record['inventarisnummer'],
+         mentionsAddress=record['adres'],
+         mentionsStreet=record['straatnaam'],
+         mentionsOriginalStreet=record['straatnaamInBron'],
+         mentionsNeighbourhoodCode=record['buurtcode'],
+         mentionsNeihbourhoodNumber=record['buurtnummer'],
+         mentionsStreetKlein=record['straatMetKleinnummer'],
+         mentionsStreetExtra=record['huisnummertoevoeging'],
+         mentionsOccupation=record['beroep'],
+         description=Literal(record['overigeGegevens'], lang='nl')
+         if record['overigeGegevens'] is not None else None,
+         inDataset=dataset)
+
+    pn, label = emitPersonName(add, record['naam'], record,
+                               derived['literalName'])
+
+    place = derived['place']
+    if place:
+        # Shared resources are only described once per graph
+        if context.isnew(place):
+            emit(add,
+                 place,
+                 LOCATIONOBSERVATION,
+                 label=[record['geboorteplaats']],
+                 inDataset=dataset)
+
+        add((place, LOCATIONOBSERVATION['documentedIn'], r))
+
+    birthDate = derived['birthDate']
+
+    birth = saaBirth.term(record['@id'])
+
+    address = derived['address']
+
+    p = saaPersonObservation.term(record['@id'])
+    emit(add,
+         p,
+         PERSONOBSERVATION,
+         hasName=[pn],
+         label=[label],
+         birth=birth,
+         birthDate=birthDate,
+         birthPlace=place,
+         documentedIn=r,
+         inDataset=dataset)
+
+    locations = []
+
+    if place:
+        birthPlace = saaStructuredValue.term(f"{record['@id']}/birthplace")
+        emit(add,
+             birthPlace,
+             STRUCTUREDVALUE,
+             value=place,
+             role=TERMS.literal("birthplace"),
+             hasTimeStamp=birthDate,
+             label=[record['geboorteplaats']])
+
+        locations.append(birthPlace)
+
+    if address:
+        loc = derived['loc']
+        postalAddress = derived['postalAddress']
+
+        # Described once per graph, for every variant of the address fields
+        if context.isnew((postalAddress, record['buurtcode'],
+                          record['buurtnummer'],
+                          record['huisnummertoevoeging'])):
+            emit(add,
+                 postalAddress,
+                 POSTALADDRESS,
+                 streetAddress=address,
+                 addressRegion=record['buurtcode'],
+                 postalCode=record['buurtnummer'],
+                 disambiguatingDescription=record['huisnummertoevoeging'],
+                 label=[address])
+
+            emit(add,
+                 loc,
+                 LOCATIONOBSERVATION,
+                 address=postalAddress,
+                 label=[address],
+                 inDataset=dataset,
+                 geoWithin=TERMS.uri(context.buurt2adamlink[record['buurtcode']])
+                 if record['buurtcode'] else None)
+
+        resident = saaStructuredValue.term(f"{record['@id']}/resident")
+        emit(add,
+             resident,
+             STRUCTUREDVALUE,
+             value=p,
+             role=TERMS.literal("resident"),
+             hasEarliestBeginTimeStamp=context.earliestBeginTimeStamp,
+             hasLatestBeginTimeStamp=context.latestBeginTimeStamp,
+             hasEarliestEndTimeStamp=context.earliestEndTimeStamp,
+             hasLatestEndTimeStamp=context.latestEndTimeStamp,
+             label=[label])
+
+        add((loc, LOCATIONOBSERVATION['documentedIn'], r))
+        add((loc, LOCATIONOBSERVATION['hasPerson'], resident))
+
+        add((p, PERSONOBSERVATION['homeLocation'], loc))
+
+        homeLocation = saaStructuredValue.term(
+            f"{record['@id']}/homelocation")
+        emit(add,
+             homeLocation,
+             STRUCTUREDVALUE,
+             value=loc,
+             role=TERMS.literal("home location"),
+             hasEarliestBeginTimeStamp=context.earliestBeginTimeStamp,
+             hasLatestBeginTimeStamp=context.latestBeginTimeStamp,
+             hasEarliestEndTimeStamp=context.earliestEndTimeStamp,
+             hasLatestEndTimeStamp=context.latestEndTimeStamp,
+             label=[address])
+
+        locations.append(homeLocation)
+
+    for location in locations:
+        add((p, PERSONOBSERVATION['hasLocation'], location))
+
+    if record['beroep']:
+        occupation = emitOccupation(add, record['beroep'],
+                                    derived['occupation'], r, context)
+
+        add((p, PERSONOBSERVATION['hasOccupation'], occupation))
+
+    role = saaRole.term(f"{record['@id']}/born")
+    roleType = context.born
+
+    # static, described once per graph
+    if context.isnew(roleType):
+        emit(add, roleType, ROLETYPE, label=['Born'])
+
+    emit(add, role, ROLE, value=p, label=[label], roleType=roleType)
+
+    emit(add,
+         birth,
+         BIRTH,
+         place=place,
+         hasTimeStamp=birthDate,
+         label=[Literal(f"Geboorte van {label}", lang='nl')],
+         principal=p,
+         hasActor=[role])
+
+    add((r, DOCUMENT['mentionsRegistered'], p))
+
+    urlScan = record['urlScan']
+    if type(urlScan) == list:
+        for i in urlScan:
+            add((r, DOCUMENT['onScan'], URIRef(i)))
+    elif urlScan is not None:
+        add((r, DOCUMENT['onScan'], URIRef(urlScan)))
+
+    return triples
+
+
+def compileOccupation(occupation, occupations2hisco, matcher=None):
+    """Compile an occupation string once into its normalized name and the
+    triples of its HISCO categories. The result is cached per occupation
+    string, for the whole process.
+
+    See:
+        - https://schema.org/CategoryCode
+        - https://druid.datalegend.net/IISG/HISCO
+
+    Args:
+        occupation (str): Occupation description from the source
+        occupations2hisco (HiscoTable): mapping of occupation to hisco code
+        matcher (OccupationMatcher, optional): Fuzzy matching for the
+        occupations without exact match. Defaults to None (exact string
+        match only).
+
+    Returns:
+        tuple: The name (Literal), the triples of the CategoryCodes, the
+        CategoryCodes (URIRef) and the confidence of the match (Literal, None
+        if there is no match)
+    """
+    compiled = OCCUPATIONS.get(occupation)
+
+    if compiled is None:
+        normalized = occupation.replace('[', '').replace(']', '').lower()
+
+        if matcher is not None:
+            categories, score = matcher(normalized)
+        else:
+            categories = occupations2hisco.get(normalized, ())
+            score = 1.0 if categories else None
+
+        triples = []
+        categorycodes = []
+        for code, category, catname in categories:
+            uri = TERMS.uri(category)
+
+            emit(triples.append,
+                 uri,
+                 CATEGORYCODE,
+                 codeValue=code,
+                 inCodeSet=HISCO,
+                 name=[catname],
+                 label=[catname])
+
+            categorycodes.append(uri)
+
+        if score is not None:
+            confidence = TERMS.literal(round(score, 2), datatype=XSD.decimal)
+        else:
+            confidence = None
+
+        compiled = OCCUPATIONS[occupation] = (TERMS.literal(normalized,
+                                                            lang='nl'),
+                                              tuple(triples),
+                                              tuple(categorycodes),
+                                              confidence)
+
+    return compiled
+
+
+def emitOccupation(add, occupation, o, record, context):
+    """Emit the OccupationObservation of an occupation string, with the HISCO
+    code on an exact or fuzzy match (cf. `getOccupation` in main.py). The
+    observation and its categories are described once per graph, every
+    record only adds its documentedIn.
+
+    Args:
+        add (callable): Called with every triple
+        occupation (str): Occupation description from the source
+        o (URIRef): IRI minted on the occupation string
+        record (URIRef): The Document (for backref)
+        context (IndexContext): Everything that is shared by the records of
+        the index
+
+    Returns:
+        URIRef: The OccupationObservation
+    """
+
+    if context.isnew(o):
+        name, triples, categorycodes, confidence = compileOccupation(
+            occupation, context.occupations2hisco, context.matcher)
+
+        if categorycodes and context.isnew(HISCO):
+            for triple in HISCOTRIPLES:
+                add(triple)
+
+        for triple in triples:
+            add(triple)
+
+        emit(add,
+             o,
+             OCCUPATIONOBSERVATION,
+             name=[name],
+             inDataset=context.dataset,
+             occupationalCategory=list(categorycodes),
+             confidence=confidence)
+
+    add((o, OCCUPATIONOBSERVATION['documentedIn'], record))
+
+    return o
+
+
+def emitPersonName(add, personname, record, literalName=None):
+    """Emit a pnv:PersonName from a personname dictionary (cf.
+    `getPersonName` in main.py).
+
+    Args:
+        add (callable): Called with every triple
+        personname (Record): The `naam` of the record
+        record (Record): The record, to mint the PersonName IRI on if there
+        is no `uuidNaam`
+        literalName (str, optional): The name parts joined. Defaults to None
+        (joined here).
+
+    Returns:
+        tuple: The PersonName resource and its label
+    """
+
+    if personname is None:
+        pn = saaPersonName.term(record['@id'])
+        emit(add, pn, PERSONNAME, nameSpecification="Unknown", label='Unknown')
+
+        return pn, 'Unknown'
+
+    if personname.get('uuidNaam', None) is not None:
+        pn = saaPersonName.term(personname['uuidNaam'])
+    else:
+        pn = saaPersonName.term(record['@id'])
+
+    if literalName is None:
+        literalName = " ".join([
+            i for i in [
+                personname['voornaam'], personname['tussenvoegsel'],
+                personname['achternaam']
+            ] if i is not None
+        ])
+
+    # A name without parts is 'Unknown', as a missing name (and as in
+    # getPersonName)
+    if literalName == "":
+        literalName = "Unknown"
+
+    label = literalName  # add a rdfs:label for readability
+
+    emit(add,
+         pn,
+         PERSONNAME,
+         givenName=personname['voornaam'],
+         surnamePrefix=personname['tussenvoegsel'],
+         baseSurname=personname['achternaam'],
+         literalName=literalName,
+         label=label)
+
+    return pn, label
@@ -17,20 +17,32 @@ import json
 
 import logging
 import itertools
-import random
-import uuid
-
-import xmltodict
+import functools
+import time
+import math
+import argparse
 
 from datetime import datetime
 import dateutil.parser
 
-from collections import defaultdict
-
+import contextlib
 import multiprocessing
 
 from models.bio import *
 from models.saa import *
+from models.session import AppendOnlyGraph
+
+from records import iterrecords, shard, ShardReader
+from columnar import xml2parquet, iterparquet, iterderived, cached
+from emitter import emitRecord, compileOccupation, HISCO, HISCOTRIPLES
+from emitter import emit, LOCATIONOBSERVATION, POSTALADDRESS
+from emitter import OCCUPATIONOBSERVATION
+from writers import NQuadsWriter, TriGWriter, COMPRESSIONS
+from merge import merge
+from manifest import Manifest, codeversion, lookupversions
+from terms import Minter, uuidkey, TERMS
+from occupations import OccupationMatcher, THRESHOLD
+from resources import hiscotable
 
 dc = Namespace("http://purl.org/dc/elements/1.1/")
 dcterms = Namespace("http://purl.org/dc/terms/")
@@ -43,35 +55,208 @@ import rdflib.graph
 rdflib.graph.DATASET_DEFAULT_GRAPH_ID = br
 
 
-def defaultify(d, defaultdict_type=None):
-    """Transform a dict-structure to defaultdicts to always return None if no
-    value is present. 
+# Lookup tables, loaded once per (worker) process by loadLookups
+BUURT2ADAMLINK = None
+OCCUPATIONS2HISCO = None
+OCCUPATIONMATCHER = None
+
+PREFIXES = {
+    'br': br,
+    'bri': saaRec,
+    'observation': saaPersonObservation,
+    'saa': saa,  # the ontology
+    'rdfs': RDFS,
+    'xsd': XSD,
+    'pnv': pnv,
+    'schema': schema,
+    'dcterms': dcterms,
+    # 'saaLocation': saaLocation,
+    # 'saaOccupation': saaOccupation,
+    'bio': bio,
+    'sem': sem,
+    'skos': skos,
+    'roar': roar,
+    'prov': prov,
+    'void': void,
+}
+
+EXTENSIONS = {'trig': '.trig', 'nquads': '.nq'}
+
+PERIODS = {
+    '1851-1853': ("1851-01-01", "1853-12-31"),
+    '1853-1863': ("1853-01-01", "1863-12-31"),
+    '1874-1893': ("1874-01-01", "1893-12-31"),
+}
+
+
+class IndexContext:
+    """Everything the mapping of a record needs that is the same for all
+    records in an index: the void dataset, the index specific namespaces, the
+    period of the register and the lookup tables.
 
     Args:
-        d (dict): The dictionary that needs modification
-        defaultdict_type (type, optional): The defaultdict type of the new 
-        dictionary. Defaults to None.
-
-    Returns:
-        dict: defaultdict
+        indexName (str): Name of the index (and of the named graph)
+        buurt2adamlink (dict): mapping of buurtcode to an Adamlink uri
+        occupations2hisco (HiscoTable, optional): mapping of occupation to
+        hisco code (cf. schema.org). Defaults to None.
+        matcher (OccupationMatcher, optional): Fuzzy matching of the
+        occupations without exact match. Defaults to None.
     """
-    if isinstance(d, dict):
-        return defaultdict(lambda: defaultdict_type,
-                           {k: defaultify(v)
-                            for k, v in d.items()})
-    elif isinstance(d, list):
-        return [defaultify(i) for i in d]
-    else:
-        return d
 
+    def __init__(self,
+                 indexName,
+                 buurt2adamlink,
+                 occupations2hisco=None,
+                 matcher=None):
+
+        self.indexName = indexName
+        self.dataset = br.term(indexName)
+
+        self.buurt2adamlink = buurt2adamlink
+        self.occupations2hisco = occupations2hisco
+        self.matcher = matcher
+
+        for period, (begin, end) in PERIODS.items():
+            if period in indexName:
+                break
+        else:
+            raise ValueError(f"No register period known for {indexName}")
+
+        # Someone is registered somewhere during the period of the register
+        self.earliestBeginTimeStamp = TERMS.literal(begin,
+                                                    datatype=XSD.datetime)
+        self.latestBeginTimeStamp = TERMS.literal(end, datatype=XSD.datetime)
+
+        self.earliestEndTimeStamp = TERMS.literal(begin, datatype=XSD.datetime)
+        self.latestEndTimeStamp = TERMS.literal(end, datatype=XSD.datetime)
+
+        self.saaLocation = Namespace(
+            f"https://data.create.humanities.uva.nl/datasets/bevolkingsregisters/Location/{indexName}/"
+        )
+
+        self.saaAddress = Namespace(
+            f"https://data.create.humanities.uva.nl/datasets/bevolkingsregisters/Address/{indexName}/"
+        )
+
+        # Places, addresses and occupations repeat a lot
+        self.location = Minter(self.saaLocation)
+        self.address = Minter(self.saaAddress)
+        self.occupation = Minter(saaOccupation)
 
-def xml2rdf(datafolder, trigfolder):
+        self.born = saaRole.term(uuidkey('born'))
+
+        # Shared resources that are already described in the graph
+        self.seen = set()
+
+    def isnew(self, key):
+        """Check if a shared resource (e.g. a LocationObservation) is not
+        described yet in the graph, and mark it as described.
+
+        Args:
+            key (hashable): The resource, with the source values that go
+            into its description if these can differ between records
+
+        Returns:
+            bool: True the first time the key is seen
+        """
+        if key in self.seen:
+            return False
+
+        self.seen.add(key)
+        return True
+
+    def mintstats(self):
+        """Report how often the minted and interned terms came from the
+        caches."""
+        for name in ['location', 'address', 'occupation']:
+            hits, misses, hitrate = getattr(self, name).stats()
+            print(f"Minted {name} IRIs: {hitrate:.1%} from cache "
+                  f"({hits} hits, {misses} misses)")
+
+        if self.matcher is not None:
+            hits, misses, hitrate = self.matcher.stats()
+            print(f"Fuzzy matched occupations: {hitrate:.1%} from cache "
+                  f"({hits} hits, {misses} misses)")
+
+        terms, hits, saved = TERMS.stats()
+        print(f"Interned terms: {terms} terms, {hits} hits, "
+              f"{saved / 2**20:.1f} MiB saved in this process")
+
+
+def loadLookups(fuzzy=None):
+    """Load the lookup tables from resources/ (Adamlink neighbourhoods and
+    the compiled HISCO occupations, see resources/hiscotable.py), if this
+    process did not do so already. Used as initializer of the worker
+    processes in xml2rdf.
+
+    Args:
+        fuzzy (float, optional): Threshold of the fuzzy matching of the
+        occupations without exact match (see occupations.py). Defaults to
+        None (no fuzzy matching).
+    """
+    global BUURT2ADAMLINK, OCCUPATIONS2HISCO, OCCUPATIONMATCHER
+
+    if BUURT2ADAMLINK is None:
+        with open('resources/adamlink_neighbourhoods.json') as infile:
+            BUURT2ADAMLINK = json.load(infile)
+
+    if OCCUPATIONS2HISCO is None:
+        OCCUPATIONS2HISCO = hiscotable.load()
+
+    if fuzzy is not None and (OCCUPATIONMATCHER is None
+                              or OCCUPATIONMATCHER.threshold != fuzzy):
+        OCCUPATIONMATCHER = OccupationMatcher(OCCUPATIONS2HISCO, fuzzy)
+
+
+def xml2rdf(datafolder,
+            trigfolder,
+            emitter='model',
+            appendonly=False,
+            outputformat='trig',
+            compression=None,
+            workers=None,
+            shardsize=None,
+            cache=None,
+            force=False,
+            fuzzy=None):
     """Convert every index in the `datafolder` to rdf in a pipeline fashion.
+
+    Files of which the content, the mapping code, the lookup tables and the
+    options did not change since the last run are skipped (see manifest.py).
+    Outputs of earlier runs that are not written again are removed.
     
     Args:
         datafolder (str): Path to datafolder. Each index data files should be in
         separate dirs. Every dir will reflect the graph name in the quads.
         trigfolder (str): Destination path. The same dir structure is created. 
+        emitter (str, optional): 'model' to map through the rdfalchemy object
+        model or 'triples' to use the direct triple emitter. Defaults to
+        'model'.
+        appendonly (bool, optional): Let the object model only add triples,
+        in batches. Defaults to False.
+        outputformat (str, optional): 'trig' or 'nquads'. Defaults to 'trig'.
+        compression (str, optional): 'gzip' or 'zstd' to compress the output
+        files. Defaults to None.
+        workers (int, optional): Number of worker processes. Defaults to None
+        (the number of CPUs).
+        shardsize (int, optional): Files larger than this number of bytes are
+        split on record boundaries and the parts are converted in parallel,
+        each into its own part file. Together the parts are the same as a
+        single file conversion, in every mode: the shared resources are
+        described in every part and each record only adds its own links to
+        them. Defaults to None (no splitting).
+        cache (str, optional): Folder for the columnar cache of the parsed
+        records (see columnar.py), so that the xml is only parsed again when
+        it changed. Parts of split files are read from the xml. Defaults to
+        None (no cache).
+        force (bool, optional): Convert every file, also the unchanged ones.
+        Defaults to False.
+        fuzzy (float, optional): Threshold of the fuzzy matching of the
+        occupations without exact HISCO match. Defaults to None (exact
+        matches only).
+
+    Returns:
+        list: (xmlfile, number of records, seconds) per converted file
     """
 
     xmlfiles = []
@@ -82,38 +267,209 @@ def xml2rdf(datafolder, trigfolder):
             continue
         else:
             xmlfiles += [(trigfolder, root, f) for f in fp]
-            random.shuffle(xmlfiles)
 
-            _, indexName = root.rsplit(os.sep)
+            _, indexName = root.rsplit(os.sep, 1)
             os.makedirs(os.path.join(trigfolder, indexName), exist_ok=True)
 
-    with multiprocessing.Pool(processes=2) as pool:
-        _ = pool.map(parsexml, xmlfiles)
+    manifest = Manifest(trigfolder)
+    settings = {
+        'code': codeversion(),
+        'lookups': lookupversions(),
+        'options': {
+            'emitter': emitter,
+            'appendonly': appendonly,
+            'outputformat': outputformat,
+            'compression': compression,
+            'shardsize': shardsize,
+            'fuzzy': fuzzy
+        }
+    }
+
+    # The outputs of xml files that were removed
+    for path in manifest.vanished():
+        removeOutputs(manifest.remove(path))
+
+    tasks = []
+    outputs = dict()
+    for trigfolder, root, f in xmlfiles:
+        path = os.path.join(root, f)
+        size = os.path.getsize(path)
+
+        if not force and manifest.unchanged(path, settings):
+            print(f"Unchanged, skipped: {path}")
+            continue
+
+        if shardsize and size > shardsize:
+            ranges = shard(path, math.ceil(size / shardsize))
+            filetasks = [(trigfolder, root, f, part, start, end)
+                         for part, (start, end) in enumerate(ranges, 1)]
+        else:
+            filetasks = [(trigfolder, root, f, None, 0, size)]
+
+        tasks += filetasks
+        outputs[path] = [
+            targetPath(*task[:4], outputformat, compression)
+            for task in filetasks
+        ]
+
+        # Outputs of the last conversion that are not written again (other
+        # parts, format or compression)
+        removeOutputs(set(manifest.outputs(path)) - set(outputs[path]))
+
+    # Largest (parts of) files first, so that none is left for the end
+    tasks.sort(key=lambda i: i[5] - i[4], reverse=True)
+
+    results = []
+
+    t0 = time.perf_counter()
+    with multiprocessing.Pool(processes=workers or os.cpu_count(),
+                              initializer=loadLookups,
+                              initargs=(fuzzy, )) as pool:
+
+        # A worker takes the next file as soon as it is done
+        for result in pool.imap_unordered(
+                functools.partial(parsexml,
+                                  emitter=emitter,
+                                  appendonly=appendonly,
+                                  outputformat=outputformat,
+                                  compression=compression,
+                                  cache=cache,
+                                  fuzzy=fuzzy), tasks):
+            results.append(result)
+
+    summarize(results, time.perf_counter() - t0)
+
+    for path, targetfiles in outputs.items():
+        manifest.update(path, settings, targetfiles)
+    manifest.save()
+
+    return results
+
+
+def removeOutputs(paths):
+    """Delete the output files of an earlier conversion.
+
+    Args:
+        paths (iterable): Paths of the output files
+    """
+    for path in sorted(paths):
+        if os.path.exists(path):
+            os.remove(path)
+            print(f"Removed stale output: {path}")
+
+
+def summarize(results, seconds):
+    """Print the wall time and number of records per converted file.
+
+    Args:
+        results (list): (xmlfile, number of records, seconds) per file
+        seconds (float): Wall time of the whole run
+    """
+
+    print(f"{'File':<70} {'Records':>10} {'Seconds':>10}")
+    for xmlfile, records, fileseconds in sorted(results,
+                                                key=lambda i: i[2],
+                                                reverse=True):
+        print(f"{xmlfile:<70} {records:>10} {fileseconds:>10.1f}")
+
+    total = sum(i[1] for i in results)
+    print(f"{len(results)} files (or parts), {total} records in {seconds:.1f}s "
+          f"({total / seconds if seconds else 0:.0f} records/s)")
+    sys.stdout.flush()
+
 
+def targetPath(trigfolder, root, f, part, outputformat, compression=None):
+    """The destination of (a part of) an xml file.
 
-def parsexml(xmlfile):
+    Args:
+        trigfolder (str): Destination path
+        root (str): Folder of the index
+        f (str): Name of the xml file
+        part (int): Part number, or None for the whole file
+        outputformat (str): 'trig' or 'nquads'
+        compression (str, optional): 'gzip' or 'zstd'. Defaults to None.
+
+    Returns:
+        str: Path of the target file
+    """
+    _, indexName = root.rsplit(os.sep, 1)
+
+    if part is not None:
+        name = f.replace('.xml', f".part{part:03d}")
+    else:
+        name = f.replace('.xml', '')
+
+    return os.path.join(trigfolder, indexName, name + EXTENSIONS[outputformat] +
+                        COMPRESSIONS.get(compression, ''))
+
+
+def parsexml(xmlfile,
+             emitter='model',
+             appendonly=False,
+             outputformat='trig',
+             compression=None,
+             cache=None,
+             batchsize=1000,
+             fuzzy=None):
     """Parse a SAA data file and convert it to a graph using rdflib.
     
     Args:
         xmlfile (tuple): combination of the destination folder, the root dir 
-        and the filepointer (str).
+        and the filepointer (str). Optionally followed by the part number and
+        the byte range of a shard of the file (see records.shard). A part is
+        written to its own part file.
+        emitter (str, optional): 'model' to map through the rdfalchemy object
+        model (mapRecord) or 'triples' to add the triples of the direct
+        emitter (emitter.emitRecord). Defaults to 'model'.
+        appendonly (bool, optional): Write the object model through an
+        AppendOnlyGraph: assignments only add triples and are flushed in
+        batches. Defaults to False.
+        outputformat (str, optional): 'trig' or 'nquads'. Either way the
+        triples are written to the target file while mapping. Defaults to
+        'trig'.
+        compression (str, optional): 'gzip' or 'zstd' to compress the target
+        file (in a background thread, see writers.BackgroundCompressor).
+        Defaults to None.
+        cache (str, optional): Folder for the columnar cache of the records
+        of the file. The cache is written if it is missing or was made from
+        other content (size and hash) and read instead of the xml. With the 'triples' emitter, the
+        derived values of the records are computed per batch from the cache.
+        Defaults to None.
+        batchsize (int, optional): Number of records after which the object
+        model graph is written out and emptied. The records after that only
+        add their links to the shared resources that were written out (see
+        mapRecord), so the output does not depend on the batch size.
+        Defaults to 1000.
+        fuzzy (float, optional): Threshold of the fuzzy matching of the
+        occupations without exact HISCO match. Defaults to None (exact
+        matches only).
+
+    Returns:
+        tuple: The xml file, the number of records and the wall time
     """
+    t0 = time.perf_counter()
 
-    trigfolder, root, f = xmlfile
-    _, indexName = root.rsplit(os.sep)
+    trigfolder, root, f, *shardrange = xmlfile
+    _, indexName = root.rsplit(os.sep, 1)
 
     xmlfile = os.path.join(root, f)
 
+    if shardrange and shardrange[0] is not None:
+        part, start, end = shardrange
+        label = f"{xmlfile} (part {part})"
+    else:
+        part = None
+        label = xmlfile
+
     # if not xmlfile.endswith(
     #         'SAA_Index_op_bevolkingsregister_1851-1853_20181004_001.xml'):
     #     return
 
-    targetfile = os.path.join(trigfolder, indexName,
-                              f.replace('.xml', '.trig'))
+    targetfile = targetPath(trigfolder, root, f, part, outputformat,
+                            compression)
 
-    # Other data (e.g. Adamlink)
-    with open('resources/adamlink_neighbourhoods.json') as infile:
-        buurt2adamlink = json.load(infile)
+    # Other data (e.g. Adamlink, HISCO)
+    loadLookups(fuzzy)
 
     ds = Dataset()
 
@@ -145,249 +501,312 @@ def parsexml(xmlfile):
     # bit of prov
     ds.add((br.term(indexName), prov.wasDerivedFrom, Literal(f)))
 
-    # For backref
-    g_void = br.term(indexName)
-
     # And the graph itself
-    g = rdfSubject.db = ds.graph(identifier=br.term(indexName))
+    g = ds.graph(identifier=br.term(indexName))
+    rdfSubject.db = AppendOnlyGraph(g) if appendonly else g
 
     # Bind prefixes
-    ds.bind('br', br)
-    ds.bind('bri', saaRec)
-    ds.bind('observation', saaPersonObservation)
-    ds.bind('saa', saa)  # the ontology
-    ds.bind('rdfs', RDFS)
-    ds.bind('xsd', XSD)
-    ds.bind('pnv', pnv)
-    ds.bind('schema', schema)
-    ds.bind('dcterms', dcterms)
-    # ds.bind('saaLocation', saaLocation)
-    # ds.bind('saaOccupation', saaOccupation)
-    ds.bind('bio', bio)
-    ds.bind('sem', sem)
-    ds.bind('skos', skos)
-    ds.bind('roar', roar)
-    ds.bind('prov', prov)
-    ds.bind('void', void)
-
-    if '1851-1853' in indexName:
-
-        earliestBeginTimeStamp = Literal("1851-01-01", datatype=XSD.datetime)
-        latestBeginTimeStamp = Literal("1853-12-31", datatype=XSD.datetime)
-
-        earliestEndTimeStamp = Literal("1851-01-01", datatype=XSD.datetime)
-        latestEndTimeStamp = Literal("1853-12-31", datatype=XSD.datetime)
-
-        with open('resources/occupations2hisco.json') as infile:
-            occupations2hisco = json.load(infile)
-
-    elif '1853-1863' in indexName:
-
-        earliestBeginTimeStamp = Literal("1853-01-01", datatype=XSD.datetime)
-        latestBeginTimeStamp = Literal("1863-12-31", datatype=XSD.datetime)
-
-        earliestEndTimeStamp = Literal("1853-01-01", datatype=XSD.datetime)
-        latestEndTimeStamp = Literal("1863-12-31", datatype=XSD.datetime)
-    elif '1874-1893' in indexName:
-
-        earliestBeginTimeStamp = Literal("1874-01-01", datatype=XSD.datetime)
-        latestBeginTimeStamp = Literal("1893-12-31", datatype=XSD.datetime)
-
-        earliestEndTimeStamp = Literal("1874-01-01", datatype=XSD.datetime)
-        latestEndTimeStamp = Literal("1893-12-31", datatype=XSD.datetime)
-
-    saaLocation = Namespace(
-        f"https://data.create.humanities.uva.nl/datasets/bevolkingsregisters/Location/{indexName}/"
-    )
-
-    saaAddress = Namespace(
-        f"https://data.create.humanities.uva.nl/datasets/bevolkingsregisters/Address/{indexName}/"
-    )
-
-    saaOccupation = Namespace(
-        f"https://data.create.humanities.uva.nl/datasets/bevolkingsregisters/Occupation/{indexName}/"
-    )
-
-    # Read the file
-    with open(xmlfile, 'rb') as xmlrbfile:
-
-        print(xmlfile)
-
-        # Since we are using >= Python3.7
-        parse = xmltodict.parse(xmlrbfile, dict_constructor=dict)
-
-        parse = defaultify(parse)
-        records = parse['indexRecords']['indexRecord']
-
-        # Parse record
-        for n, record in enumerate(records):
-
-            if n % 5000 == 0:
-                print(f"{n}/{len(records)} from {f}")
-                sys.stdout.flush()
-
-            r = Document(
-                saaRec.term(record['@id']),
-                identifier=record['@id'],
-                inventoryNumber=record['inventarisnummer'],
-                mentionsAddress=record['adres'],
-                mentionsStreet=record['straatnaam'],
-                mentionsOriginalStreet=record['straatnaamInBron'],
-                mentionsNeighbourhoodCode=record['buurtcode'],
-                mentionsNeihbourhoodNumber=record['buurtnummer'],
-                mentionsStreetKlein=record['straatMetKleinnummer'],
-                mentionsStreetExtra=record['huisnummertoevoeging'],
-                mentionsOccupation=record['beroep'],
-                description=Literal(record['overigeGegevens'], lang='nl')
-                if record['overigeGegevens'] is not None else None,
-                inDataset=g_void)
-
-            pn = getPersonName(record['naam'])
-
-            if record['geboorteplaats']:
-                place = LocationObservation(saaLocation.term(
-                    str(
-                        uuid.uuid5(uuid.NAMESPACE_OID,
-                                   record['geboorteplaats']))),
-                                            label=[record['geboorteplaats']],
-                                            documentedIn=r,
-                                            inDataset=g_void)
+    for prefix, namespace in PREFIXES.items():
+        ds.bind(prefix, namespace)
+
+    context = IndexContext(indexName, BUURT2ADAMLINK, OCCUPATIONS2HISCO,
+                           OCCUPATIONMATCHER if fuzzy is not None else None)
+
+    if outputformat == 'nquads':
+        writer = NQuadsWriter(targetfile)
+    else:
+        writer = TriGWriter(targetfile, PREFIXES)
+
+    # Closed (and its compressor stopped) also if the mapping fails
+    with writer:
+        # The void descriptions, in the default graph
+        writer.write(ds.default_context)
+
+        def drain():
+            """Write out and empty the graph of the object model."""
+            if appendonly:
+                rdfSubject.db.flush()
+
+            writer.write(g, g.identifier)
+            g.remove((None, None, None))
+
+        # Read the file (or the part of it), or its columnar cache
+        if part is None and cache is not None:
+            cachefile = os.path.join(cache, indexName,
+                                     f.replace('.xml', '.parquet'))
+            # Tied to the content of the xml, not to its modification time
+            fingerprint = Manifest(trigfolder).fingerprint(xmlfile)
+            if not cached(cachefile, fingerprint):
+                xml2parquet(xmlfile, cachefile, fingerprint=fingerprint)
+
+            xmlrbfile = contextlib.nullcontext()
+
+            # With the values the mapping derives from the fields computed
+            # per column (see columnar.derivebatch)
+            if emitter == 'triples':
+                records = iterderived(cachefile, context)
             else:
-                place = None
-
-            birth = Birth(
-                None,
-                place=place,
-                hasTimeStamp=Literal(record['geboortedatum'],
-                                     datatype=XSD.datetime)
-                if record['geboortedatum'] is not None else None,
-                label=[Literal(f"Geboorte van {pn.label}", lang='nl')])
-
-            # need a unique entry for the adres
-            if record['huisnummertoevoeging'] and record['adres']:
-                disambiguatingAddress = f"{record['adres']} {record['huisnummertoevoeging']}"
+                records = ((record, None)
+                           for record in iterparquet(cachefile))
+        else:
+            if part is None:
+                xmlrbfile = open(xmlfile, 'rb')
             else:
-                disambiguatingAddress = None
-
-            address = record[
-                'straatMetKleinnummer'] or disambiguatingAddress or record[
-                    'adres'] or record['straatnaamInBron'] or record[
-                        'buurtnummer'] or record['buurtnummer']
-
-            p = PersonObservation(
-                saaPersonObservation.term(record['@id']),
-                #identifier=int(record['@id'].replace('saaId')),
-                hasName=[pn],
-                label=[pn.label],
-                birth=birth,
-                birthDate=birth.hasTimeStamp,
-                birthPlace=birth.place,
-                documentedIn=r,
-                inDataset=g_void)  # homeLocation?
-
-            if address:
-                identifier = str(uuid.uuid5(uuid.NAMESPACE_OID, address))
-
-                loc = LocationObservation(
-                    saaLocation.term(identifier),
-                    address=PostalAddress(
-                        saaAddress.term(identifier),
-                        streetAddress=address,
-                        addressRegion=record['buurtcode'],
-                        postalCode=record['buurtnummer'],
-                        disambiguatingDescription=record[
-                            'huisnummertoevoeging'],
-                        label=[address] if address else None),
-                    label=[address] if address else ["Unknown"],
-                    documentedIn=r,
-                    inDataset=g_void)
-
-                p.homeLocation = loc
-
-                loc.hasPerson = [
-                    StructuredValue(
-                        value=p,
-                        role="resident",
-                        hasEarliestBeginTimeStamp=earliestBeginTimeStamp,
-                        hasLatestBeginTimeStamp=latestBeginTimeStamp,
-                        hasEarliestEndTimeStamp=earliestEndTimeStamp,
-                        hasLatestEndTimeStamp=latestEndTimeStamp,
-                        label=p.label)
-                ]
-
-                homeLocation = StructuredValue(
-                    value=loc,
-                    role="home location",
-                    hasEarliestBeginTimeStamp=earliestBeginTimeStamp,
-                    hasLatestBeginTimeStamp=latestBeginTimeStamp,
-                    hasEarliestEndTimeStamp=earliestEndTimeStamp,
-                    hasLatestEndTimeStamp=latestEndTimeStamp,
-                    label=loc.label)
-
-                if record['buurtcode']:
-                    loc.geoWithin = URIRef(buurt2adamlink[record['buurtcode']])
+                xmlrbfile = ShardReader(xmlfile, start, end)
 
-            else:
-                homeLocation = None
+            # Stream the records, one indexRecord in memory at a time
+            records = ((record, None) for record in iterrecords(xmlrbfile))
 
-            if place:
-                birthPlace = StructuredValue(value=place,
-                                             role="birthplace",
-                                             hasTimeStamp=birth.hasTimeStamp,
-                                             label=place.label)
+        with xmlrbfile:
 
-            else:
-                birthPlace = None
+            print(label)
+
+            # Parse record
+            n = 0
+            for n, (record, derived) in enumerate(records, 1):
 
-            if birthPlace and homeLocation:
-                p.hasLocation = [birthPlace, homeLocation]
-            elif homeLocation:
-                p.hasLocation = [homeLocation]
-            elif place:
-                p.hasLocation = [birthPlace]
+                if n % 5000 == 0:
+                    print(f"{n} records from {label}")
+                    sys.stdout.flush()
 
-            if record['beroep']:
+                if emitter == 'triples':
+                    triples = emitRecord(record, context, derived)
 
-                identifier = str(
-                    uuid.uuid5(uuid.NAMESPACE_OID, record['beroep']))
+                    writer.write(triples, g.identifier)
+                else:
+                    mapRecord(record, context)
 
-                # Let's try to put a HISCO code already in the Observation [=exact string match]
-                occupation = getOccupation(record['beroep'],
-                                           identifier=identifier,
-                                           record=r,
-                                           dataset=g_void,
-                                           occupations2hisco=occupations2hisco)
+                    if n % batchsize == 0:
+                        drain()
 
-                p.hasOccupation = [occupation]
+        context.mintstats()
 
-            birth.principal = p
-            birth.hasActor = [
-                Role(None,
-                     value=p,
-                     label=p.label,
-                     roleType=RoleType(saaRole.term(
-                         str(uuid.uuid5(uuid.NAMESPACE_OID, 'born'))),
-                                       label=['Born']))
-            ]
+        if emitter != 'triples':
+            drain()
 
-            r.mentionsRegistered = [p]
+    print(f"Written the graph to: {targetfile}")
+    sys.stdout.flush()
 
-            if type(record['urlScan']) == list:
-                r.onScan = [URIRef(i) for i in record['urlScan']]
-            elif record['urlScan'] is not None:
-                r.onScan = [URIRef(record['urlScan'])]
+    return label, n, time.perf_counter() - t0
 
-        print(f"Writing the graph to: {targetfile}")
-        sys.stdout.flush()
-        ds.serialize(targetfile, format='trig')
 
+def mapRecord(record, context):
+    """Map a SAA indexRecord to the object model (models/saa.py and
+    models/bio.py). The resources are added to `rdfSubject.db`.
 
-def getOccupation(occupation, identifier, record, dataset, occupations2hisco):
+    Args:
+        record (Record): The indexRecord
+        context (IndexContext): Everything that is shared by the records of
+        the index
+    """
+
+    r = Document(
+        saaRec.term(record['@id']),
+        identifier=record['@id'],
+        inventoryNumber=record['inventarisnummer'],
+        mentionsAddress=record['adres'],
+        mentionsStreet=record['straatnaam'],
+        mentionsOriginalStreet=record['straatnaamInBron'],
+        mentionsNeighbourhoodCode=record['buurtcode'],
+        mentionsNeihbourhoodNumber=record['buurtnummer'],
+        mentionsStreetKlein=record['straatMetKleinnummer'],
+        mentionsStreetExtra=record['huisnummertoevoeging'],
+        mentionsOccupation=record['beroep'],
+        description=Literal(record['overigeGegevens'], lang='nl')
+        if record['overigeGegevens'] is not None else None,
+        inDataset=context.dataset)
+
+    pn = getPersonName(record['naam'], record)
+
+    if record['geboorteplaats']:
+        uri = context.location(record['geboorteplaats'])
+
+        # Shared resources are only described once per graph
+        if context.isnew(uri):
+            place = LocationObservation(uri,
+                                        label=[record['geboorteplaats']],
+                                        inDataset=context.dataset)
+        else:
+            place = LocationObservation(uri)
+
+        # Every record adds its own link to a shared resource. An assignment
+        # would replace those of the records before (documentedIn is an
+        # rdfSingle).
+        rdfSubject.db.add((uri, LOCATIONOBSERVATION['documentedIn'], r.resUri))
+    else:
+        place = None
+
+    birth = Birth(
+        saaBirth.term(record['@id']),
+        place=place,
+        hasTimeStamp=TERMS.literal(record['geboortedatum'],
+                                   datatype=XSD.datetime)
+        if record['geboortedatum'] is not None else None,
+        label=[Literal(f"Geboorte van {pn.label}", lang='nl')])
+
+    # need a unique entry for the adres
+    if record['huisnummertoevoeging'] and record['adres']:
+        disambiguatingAddress = f"{record['adres']} {record['huisnummertoevoeging']}"
+    else:
+        disambiguatingAddress = None
+
+    address = record[
+        'straatMetKleinnummer'] or disambiguatingAddress or record[
+            'adres'] or record['straatnaamInBron'] or record[
+                'buurtnummer'] or record['buurtnummer']
+
+    p = PersonObservation(
+        saaPersonObservation.term(record['@id']),
+        #identifier=int(record['@id'].replace('saaId')),
+        hasName=[pn],
+        label=[pn.label],
+        birth=birth,
+        birthDate=birth.hasTimeStamp,
+        birthPlace=birth.place,
+        documentedIn=r,
+        inDataset=context.dataset)  # homeLocation?
+
+    if address:
+        uri = context.location(address)
+        addressuri = context.address(address)
+
+        geoWithin = TERMS.uri(context.buurt2adamlink[record['buurtcode']]
+                              ) if record['buurtcode'] else None
+
+        # Described once per graph, for every variant of the address fields
+        if not context.isnew((addressuri, record['buurtcode'],
+                              record['buurtnummer'],
+                              record['huisnummertoevoeging'])):
+            loc = LocationObservation(uri)
+        elif context.isnew(addressuri):
+            loc = LocationObservation(
+                uri,
+                address=PostalAddress(
+                    addressuri,
+                    streetAddress=address,
+                    addressRegion=record['buurtcode'],
+                    postalCode=record['buurtnummer'],
+                    disambiguatingDescription=record['huisnummertoevoeging'],
+                    label=[address]),
+                label=[address],
+                inDataset=context.dataset)
+
+            if geoWithin:
+                loc.geoWithin = geoWithin
+        else:
+            # Another variant of an address that is described already: its
+            # values are added next to those of the first variant, as
+            # assignments would replace them
+            loc = LocationObservation(uri)
+
+            emit(rdfSubject.db.add,
+                 addressuri,
+                 POSTALADDRESS,
+                 streetAddress=address,
+                 addressRegion=record['buurtcode'],
+                 postalCode=record['buurtnummer'],
+                 disambiguatingDescription=record['huisnummertoevoeging'],
+                 label=[address])
+
+            emit(rdfSubject.db.add,
+                 uri,
+                 LOCATIONOBSERVATION,
+                 address=addressuri,
+                 label=[address],
+                 inDataset=context.dataset,
+                 geoWithin=geoWithin)
+
+        p.homeLocation = loc
+
+        resident = StructuredValue(
+            saaStructuredValue.term(f"{record['@id']}/resident"),
+            value=p,
+            role=TERMS.literal("resident"),
+            hasEarliestBeginTimeStamp=context.earliestBeginTimeStamp,
+            hasLatestBeginTimeStamp=context.latestBeginTimeStamp,
+            hasEarliestEndTimeStamp=context.earliestEndTimeStamp,
+            hasLatestEndTimeStamp=context.latestEndTimeStamp,
+            label=p.label)
+
+        # The links of the record to the shared location
+        rdfSubject.db.add((uri, LOCATIONOBSERVATION['documentedIn'], r.resUri))
+        rdfSubject.db.add(
+            (uri, LOCATIONOBSERVATION['hasPerson'], resident.resUri))
+
+        homeLocation = StructuredValue(
+            saaStructuredValue.term(f"{record['@id']}/homelocation"),
+            value=loc,
+            role=TERMS.literal("home location"),
+            hasEarliestBeginTimeStamp=context.earliestBeginTimeStamp,
+            hasLatestBeginTimeStamp=context.latestBeginTimeStamp,
+            hasEarliestEndTimeStamp=context.earliestEndTimeStamp,
+            hasLatestEndTimeStamp=context.latestEndTimeStamp,
+            label=[address])
+
+    else:
+        homeLocation = None
+
+    if place:
+        birthPlace = StructuredValue(
+            saaStructuredValue.term(f"{record['@id']}/birthplace"),
+            value=place,
+            role=TERMS.literal("birthplace"),
+            hasTimeStamp=birth.hasTimeStamp,
+            label=[record['geboorteplaats']])
+
+    else:
+        birthPlace = None
+
+    if birthPlace and homeLocation:
+        p.hasLocation = [birthPlace, homeLocation]
+    elif homeLocation:
+        p.hasLocation = [homeLocation]
+    elif place:
+        p.hasLocation = [birthPlace]
+
+    if record['beroep']:
+
+        # Let's try to put a HISCO code already in the Observation [=exact string match]
+        occupation = getOccupation(record['beroep'],
+                                   uri=context.occupation(record['beroep']),
+                                   record=r,
+                                   context=context)
+
+        p.hasOccupation = [occupation]
+
+    # static, described once per graph
+    if context.isnew(context.born):
+        roleType = RoleType(context.born, label=['Born'])
+    else:
+        roleType = RoleType(context.born)
+
+    birth.principal = p
+    birth.hasActor = [
+        Role(saaRole.term(f"{record['@id']}/born"),
+             value=p,
+             label=p.label,
+             roleType=roleType)
+    ]
+
+    r.mentionsRegistered = [p]
+
+    if type(record['urlScan']) == list:
+        r.onScan = [URIRef(i) for i in record['urlScan']]
+    elif record['urlScan'] is not None:
+        r.onScan = [URIRef(record['urlScan'])]
+
+
+def getOccupation(occupation, uri, record, context):
     """Lookup the HISCO OccupationalCode for the given string. 
     
     It compares on an exact match of the occupation description give in the 
-    source. More work should be done (e.g. fuzzy matching? Further 
-    interpretatin?) in an OccupationReconstruction.
+    source and otherwise on the most similar HISCO name (occupations.py), with
+    the similarity as confidence. More work should be done (e.g. further
+    interpretation?) in an OccupationReconstruction.
+
+    The categories of an occupation string are compiled once per process
+    (emitter.compileOccupation) and the observation is described once per
+    graph. After that, only the documentedIn of the record is added.
 
     See: 
         - https://schema.org/CategoryCode
@@ -395,46 +814,41 @@ def getOccupation(occupation, identifier, record, dataset, occupations2hisco):
     
     Args:
         occupation (str): Occupation description from the source
-        identifier (str): uuid generated on the occupation string
+        uri (URIRef): IRI minted on the occupation string
         record (Document): Document object (for backref)
-        dataset (URIRef): Pointer to the void dataset [=graph]
-        occupations2hisco (dict): mapping of occupation to hisco code (cf. schema.org)
+        context (IndexContext): Everything that is shared by the records of
+        the index
     
     Returns:
         OccupationObservation: The mentioned occupation as OccupationObservation.
     """
-    occupation = occupation.replace('[', '').replace(']', '').lower()
 
-    name = Literal(occupation, lang='nl')
+    # Every record adds its own documentedIn (an assignment would replace
+    # those of the records before)
+    rdfSubject.db.add((uri, OCCUPATIONOBSERVATION['documentedIn'],
+                       record.resUri))
 
-    o = OccupationObservation(saaOccupation.term(identifier),
-                              name=[name],
-                              documentedIn=record,
-                              inDataset=dataset)
+    if not context.isnew(uri):
+        return OccupationObservation(uri)
 
-    if occupations2hisco[occupation] == []:
-        return o
+    name, triples, categorycodes, confidence = compileOccupation(
+        occupation, context.occupations2hisco, context.matcher)
 
-    categorycodes = []
-    for r in occupations2hisco[occupation]:
-        uri = r['hiscoCategory']['value']
-        code = r['hiscoCode']['value']
-        catname = r['hiscoCategoryName']['value']
+    # The ready-made CategoryCode(Set) triples
+    if categorycodes and context.isnew(HISCO):
+        for triple in HISCOTRIPLES:
+            rdfSubject.db.add(triple)
 
-        # static
-        codeset = CategoryCodeSet(
-            URIRef("https://iisg.amsterdam/resource/hisco/HISCO"),
-            label=['HISCO'],
-            name=['HISCO'])
+    for triple in triples:
+        rdfSubject.db.add(triple)
 
-        catcode = CategoryCode(URIRef(uri),
-                               codeValue=code,
-                               inCodeSet=codeset,
-                               name=[catname],
-                               label=[catname])
-        categorycodes.append(catcode)
+    o = OccupationObservation(uri,
+                              name=[name],
+                              inDataset=context.dataset)
 
-    o.occupationalCategory = categorycodes
+    if categorycodes:
+        o.occupationalCategory = list(categorycodes)
+        o.confidence = confidence
 
     return o
 
@@ -445,41 +859,112 @@ def getPersonName(personname, record=None):
     Args:
         personname (dict): Dictionary from the xml2dict package that contains
         one or several PersonName fields. 
+        record (Record, optional): The record, to mint the IRI of the
+        PersonName on if there is no `uuidNaam`. Defaults to None (a blank
+        node).
     
     Returns:
         PersonName: A RDF resource that can be used in rdflib
     """
 
+    if record is not None:
+        uuid = saaPersonName.term(record['@id'])
+    else:
+        uuid = None
+
     if personname is None:
-        return PersonName(None, nameSpecification="Unknown", label='Unknown')
+        return PersonName(uuid, nameSpecification="Unknown", label='Unknown')
 
     if personname.get('uuidNaam', None) is not None:
         uuid = saaPersonName.term(personname['uuidNaam'])
-    else:
-        uuid = None
 
-    pn = PersonName(
-        uuid,
-        givenName=personname['voornaam'],
-        surnamePrefix=personname['tussenvoegsel'],
-        baseSurname=personname['achternaam'],
-        literalName=" ".join([
-            i for i in [
-                personname['voornaam'], personname['tussenvoegsel'],
-                personname['achternaam']
-            ] if i is not None
-        ]))
-
-    if pn.literalName == "":
-        pn.literalName = "Unknown"
-    else:
-        pn.label = pn.literalName  # add a rdfs:label for readability
+    literalName = " ".join([
+        i for i in [
+            personname['voornaam'], personname['tussenvoegsel'],
+            personname['achternaam']
+        ] if i is not None
+    ])
+
+    # Decided before the PersonName is made, so that no attribute is
+    # assigned twice (in append-only mode that would keep both values). A
+    # name without parts is 'Unknown', as a missing name (and as in
+    # emitter.emitPersonName).
+    if literalName == "":
+        literalName = "Unknown"
 
-    return pn
+    return PersonName(uuid,
+                      givenName=personname['voornaam'],
+                      surnamePrefix=personname['tussenvoegsel'],
+                      baseSurname=personname['achternaam'],
+                      literalName=literalName,
+                      label=literalName)  # add a rdfs:label for readability
 
 
 if __name__ == "__main__":
     DATAPATH = "data/"
     TRIGPATH = "trig/"
 
-    xml2rdf(datafolder=DATAPATH, trigfolder=TRIGPATH)
+    parser = argparse.ArgumentParser(
+        description="Convert the SAA bevolkingsregister indices to RDF.")
+    parser.add_argument('--data', default=DATAPATH, help="Data folder")
+    parser.add_argument('--output', default=TRIGPATH, help="Output folder")
+    parser.add_argument('--workers',
+                        type=int,
+                        default=None,
+                        help="Number of worker processes (default: CPUs)")
+    parser.add_argument('--emitter',
+                        choices=['model', 'triples'],
+                        default='model')
+    parser.add_argument('--appendonly', action='store_true')
+    parser.add_argument('--shardsize',
+                        type=int,
+                        default=None,
+                        help="Split files larger than this (MB) over workers")
+    parser.add_argument('--format',
+                        choices=list(EXTENSIONS),
+                        default='trig',
+                        dest='outputformat')
+    parser.add_argument('--compression',
+                        choices=list(COMPRESSIONS),
+                        default=None,
+                        help="Compress the output files")
+    parser.add_argument(
+        '--merge',
+        default=None,
+        help="Merge the N-Quads output into deduplicated dumps in this folder "
+        "(with --format nquads)")
+    parser.add_argument(
+        '--fuzzy',
+        type=float,
+        nargs='?',
+        const=THRESHOLD,
+        default=None,
+        help="Fuzzy match the occupations without exact HISCO match, with "
+        f"this minimal similarity (default: {THRESHOLD})")
+    parser.add_argument('--force',
+                        action='store_true',
+                        help="Also convert the files that did not change")
+    parser.add_argument(
+        '--cache',
+        default=None,
+        help="Folder for a columnar cache of the parsed records (pyarrow)")
+    args = parser.parse_args()
+
+    # merge.py only reads N-Quads
+    if args.merge and args.outputformat != 'nquads':
+        parser.error("--merge needs --format nquads")
+
+    xml2rdf(datafolder=args.data,
+            trigfolder=args.output,
+            emitter=args.emitter,
+            appendonly=args.appendonly,
+            outputformat=args.outputformat,
+            compression=args.compression,
+            workers=args.workers,
+            shardsize=args.shardsize * 2**20 if args.shardsize else None,
+            cache=args.cache,
+            force=args.force,
+            fuzzy=args.fuzzy)
+
+    if args.merge:
+        merge(args.output, args.merge, args.compression)
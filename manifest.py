@@ -0,0 +1,190 @@
+"""
+Manifest of a conversion, for incremental re-runs of xml2rdf.
+
+It records per xml file the content hash, the version of the mapping code,
+the versions of the lookup tables and the options with which its output was
+written. A file for which all of these are unchanged (and of which the
+output still exists) does not have to be converted again.
+
+The outputs of the previous conversion that a new one does not write again
+(e.g. the parts of a file that shrunk, or the files in another format), and
+the outputs of xml files that were removed, are deleted. Otherwise merge.py
+would take their stale records along.
+"""
+
+import os
+import json
+import hashlib
+
+from resources import hiscotable
+
+MANIFEST = 'manifest.json'
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# The code that determines the output
+CODE = [
+    'main.py', 'emitter.py', 'records.py', 'columnar.py', 'terms.py',
+    'occupations.py', 'writers.py', 'models/saa.py', 'models/bio.py',
+    'models/session.py'
+]
+
+LOOKUPS = {
+    'adamlink': os.path.join(HERE, 'resources', 'adamlink_neighbourhoods.json'),
+    'hisco': hiscotable.DBFILE
+}
+
+
+def filehash(path):
+    """The sha256 of the content of a file.
+
+    Args:
+        path (str): The file
+
+    Returns:
+        str: Hex digest
+    """
+    h = hashlib.sha256()
+    with open(path, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(2**20), b''):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+def codeversion():
+    """The version of the mapping code: one hash over its source files.
+
+    Returns:
+        str: Hex digest
+    """
+    h = hashlib.sha256()
+    for path in CODE:
+        h.update(path.encode())
+        h.update(filehash(os.path.join(HERE, path)).encode())
+
+    return h.hexdigest()
+
+
+def lookupversions():
+    """The versions of the lookup tables (the hash of their files).
+
+    Returns:
+        dict: name: hex digest
+    """
+    # Make sure the HISCO table is compiled and up to date, as the workers
+    # will load it
+    hiscotable.load().close()
+
+    return {name: filehash(path) for name, path in LOOKUPS.items()}
+
+
+class Manifest:
+    """The manifest in an output folder.
+
+    Args:
+        trigfolder (str): Output folder of xml2rdf
+    """
+
+    def __init__(self, trigfolder):
+        self.path = os.path.join(trigfolder, MANIFEST)
+
+        if os.path.exists(self.path):
+            with open(self.path) as infile:
+                self.entries = json.load(infile)
+        else:
+            self.entries = dict()
+
+    def fingerprint(self, xmlfile):
+        """Size, modification time and content hash of an xml file. The hash
+        in the manifest is reused if the size and time did not change.
+
+        Args:
+            xmlfile (str): Path to the xml file
+
+        Returns:
+            dict: size, mtime and hash
+        """
+        stat = os.stat(xmlfile)
+        entry = self.entries.get(xmlfile, {})
+
+        if entry.get('size') == stat.st_size and entry.get(
+                'mtime') == stat.st_mtime:
+            digest = entry['hash']
+        else:
+            digest = filehash(xmlfile)
+
+        return {'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': digest}
+
+    def unchanged(self, xmlfile, settings):
+        """Whether the output of an xml file is up to date.
+
+        Args:
+            xmlfile (str): Path to the xml file
+            settings (dict): Code version, lookup versions and options of
+            this run
+
+        Returns:
+            bool: True if the file does not have to be converted again
+        """
+        entry = self.entries.get(xmlfile)
+        if entry is None:
+            return False
+
+        return (entry['settings'] == settings
+                and all(os.path.exists(output) for output in entry['outputs'])
+                and entry['hash'] == self.fingerprint(xmlfile)['hash'])
+
+    def outputs(self, xmlfile):
+        """The files that the last conversion of an xml file wrote.
+
+        Args:
+            xmlfile (str): Path to the xml file
+
+        Returns:
+            list: Paths of the output files
+        """
+        return self.entries.get(xmlfile, {}).get('outputs', [])
+
+    def vanished(self):
+        """The xml files in the manifest that no longer exist.
+
+        Returns:
+            list: Paths of the xml files
+        """
+        return [
+            xmlfile for xmlfile in self.entries
+            if not os.path.exists(xmlfile)
+        ]
+
+    def remove(self, xmlfile):
+        """Drop the entry of an xml file.
+
+        Args:
+            xmlfile (str): Path to the xml file
+
+        Returns:
+            list: The files its last conversion wrote
+        """
+        return self.entries.pop(xmlfile).get('outputs', [])
+
+    def update(self, xmlfile, settings, outputs):
+        """Record the conversion of an xml file.
+
+        Args:
+            xmlfile (str): Path to the xml file
+            settings (dict): Code version, lookup versions and options
+            outputs (list): The files the conversion wrote
+        """
+        self.entries[xmlfile] = {
+            **self.fingerprint(xmlfile), 'settings': settings,
+            'outputs': outputs
+        }
+
+    def save(self):
+        """Write the manifest (atomically)."""
+        tmpfile = self.path + '.tmp'
+        with open(tmpfile, 'w') as outfile:
+            json.dump(self.entries, outfile, indent=1, sort_keys=True)
+
+        os.replace(tmpfile, self.path)
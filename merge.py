@@ -0,0 +1,209 @@
+"""
+Merge the N-Quads files of a conversion (one per xml file or part) into one
+deduplicated dump per index and one combined dump.
+
+The shared resources (locations, occupations, the void descriptions) are
+written again in every file. An external sort with bounded memory brings the
+duplicates together: the quads are sorted in runs of `chunksize` lines that
+are written to temporary files, and the runs are merged with `heapq.merge`.
+
+Blank node labels are kept as they are. The conversion itself mints no blank
+nodes: the births, roles, structured values and person names get IRIs that
+are derived from the record @id.
+
+Usage:
+    python merge.py trig/ merged/ [--compression gzip|zstd]
+"""
+
+import io
+import os
+import gzip
+import heapq
+import argparse
+import tempfile
+
+from writers import openOutput, COMPRESSIONS
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+EXTENSIONS = tuple('.nq' + extension
+                   for extension in ['', *COMPRESSIONS.values()])
+
+
+def openInput(path):
+    """Open an (optionally compressed) N-Quads file for reading text.
+
+    Args:
+        path (str): .nq, .nq.gz or .nq.zst file
+
+    Returns:
+        TextIO: The file
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError("zstd input needs the zstandard package")
+        return io.TextIOWrapper(
+            zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'),
+                                                       closefd=True),
+            encoding='utf-8')
+
+    return open(path, encoding='utf-8')
+
+
+def unique(lines):
+    """Drop the repeats in sorted lines."""
+    previous = None
+    for line in lines:
+        if line != previous:
+            yield line
+            previous = line
+
+
+def sortruns(paths, tmpdir, chunksize=1000000):
+    """Sort the quads of the files in runs of at most `chunksize` lines.
+
+    Args:
+        paths (list): N-Quads files
+        tmpdir (str): Folder for the runs
+        chunksize (int, optional): Lines per run (the memory bound). Defaults
+        to 1000000.
+
+    Returns:
+        list: The paths of the sorted runs
+    """
+    runs = []
+
+    def flush(chunk):
+        chunk.sort()
+
+        run = os.path.join(tmpdir, f"run{len(runs):05d}.nq")
+        with open(run, 'w', encoding='utf-8') as outfile:
+            outfile.writelines(unique(chunk))
+
+        runs.append(run)
+
+    chunk = []
+    for path in paths:
+        with openInput(path) as infile:
+            for line in infile:
+                if not line.strip() or line.startswith('#'):
+                    continue
+
+                if not line.endswith('\n'):
+                    line += '\n'
+                chunk.append(line)
+
+                if len(chunk) >= chunksize:
+                    flush(chunk)
+                    chunk = []
+
+    if chunk:
+        flush(chunk)
+
+    return runs
+
+
+def mergeruns(runs, target):
+    """Merge sorted files into one deduplicated file.
+
+    Args:
+        runs (list): Sorted N-Quads files
+        target (str): Destination (.nq, .nq.gz or .nq.zst)
+
+    Returns:
+        int: Number of quads written
+    """
+    files = [openInput(run) for run in runs]
+
+    n = 0
+    try:
+        with openOutput(target) as outfile:
+            for line in unique(heapq.merge(*files)):
+                outfile.write(line)
+                n += 1
+    finally:
+        for f in files:
+            f.close()
+
+    return n
+
+
+def merge(trigfolder, mergefolder, compression=None, chunksize=1000000):
+    """Merge the N-Quads files in every index folder of a conversion into a
+    sorted, deduplicated dump per index (`mergefolder/<index>.nq`) and
+    combine those into `mergefolder/all.nq`.
+
+    Args:
+        trigfolder (str): Output folder of xml2rdf (with outputformat
+        'nquads')
+        mergefolder (str): Destination folder
+        compression (str, optional): 'gzip' or 'zstd' to compress the dumps.
+        Defaults to None.
+        chunksize (int, optional): Lines per sorted run. Defaults to 1000000.
+
+    Returns:
+        dict: Number of quads per dump
+    """
+    os.makedirs(mergefolder, exist_ok=True)
+    extension = '.nq' + COMPRESSIONS.get(compression, '')
+
+    counts = dict()
+    dumps = []
+
+    for indexName in sorted(os.listdir(trigfolder)):
+        folder = os.path.join(trigfolder, indexName)
+        if not os.path.isdir(folder):
+            continue
+
+        paths = [
+            os.path.join(folder, f) for f in sorted(os.listdir(folder))
+            if f.endswith(EXTENSIONS)
+        ]
+        if not paths:
+            continue
+
+        target = os.path.join(mergefolder, indexName + extension)
+
+        with tempfile.TemporaryDirectory(dir=mergefolder) as tmpdir:
+            runs = sortruns(paths, tmpdir, chunksize)
+            counts[target] = mergeruns(runs, target)
+
+        print(f"{len(paths)} files, {counts[target]} quads merged into "
+              f"{target}")
+        dumps.append(target)
+
+    # The dumps are sorted already
+    if dumps:
+        target = os.path.join(mergefolder, 'all' + extension)
+        counts[target] = mergeruns(dumps, target)
+
+        print(f"{len(dumps)} indices, {counts[target]} quads combined into "
+              f"{target}")
+
+    return counts
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Merge the N-Quads output of main.py into one "
+        "deduplicated dump per index and one combined dump.")
+    parser.add_argument('trigfolder', help="Output folder of main.py")
+    parser.add_argument('mergefolder', help="Destination folder")
+    parser.add_argument('--compression',
+                        choices=list(COMPRESSIONS),
+                        default=None)
+    parser.add_argument('--chunksize',
+                        type=int,
+                        default=1000000,
+                        help="Lines per sorted run (bounds the memory)")
+    args = parser.parse_args()
+
+    merge(args.trigfolder, args.mergefolder, args.compression,
+          args.chunksize)
@@ -57,6 +57,11 @@ saaOccupation = Namespace(
 )
 saaRole = Namespace(
     "https://data.create.humanities.uva.nl/datasets/bevolkingsregisters/Role/")
+saaBirth = Namespace(
+    "https://data.create.humanities.uva.nl/datasets/bevolkingsregisters/Birth/")
+saaStructuredValue = Namespace(
+    "https://data.create.humanities.uva.nl/datasets/bevolkingsregisters/StructuredValue/"
+)
 
 # Void
 
@@ -295,6 +300,8 @@ class OccupationObservation(Entity):
 
     occupationalCategory = rdfMultiple(schema.occupationalCategory,
                                        range_type=schema.CategoryCode)
+    # Similarity of the occupation and the matched HISCO name (1.0 is exact)
+    confidence = rdfSingle(saa.confidence)
 
 
 class CategoryCode(rdfSubject):
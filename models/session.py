@@ -0,0 +1,69 @@
+"""
+Append-only session for the models in saa.py, bio.py and prov.py.
+"""
+
+
+class AppendOnlyGraph:
+    """Stand-in for `rdfSubject.db` for conversions in which every subject is
+    freshly minted.
+
+    rdfalchemy removes the old value(s) before every rdfSingle/rdfMultiple
+    assignment. On a new subject there is nothing to remove, so in this mode
+    an assignment only adds. The triples are buffered and flushed to the
+    graph with `addN` in batches. Anything else (e.g. reading a value)
+    flushes first and is then handed to the graph.
+
+    Note that removes are ignored altogether: re-assigning an attribute of an
+    existing resource adds the new value next to the old one.
+
+    Args:
+        graph (Graph): The graph to write to
+        batchsize (int, optional): Number of triples per `addN`. Defaults to
+        10000.
+    """
+
+    def __init__(self, graph, batchsize=10000):
+        self.graph = graph
+        self.batchsize = batchsize
+
+        # dict as ordered set, for the existence checks of rdfalchemy
+        self._pending = dict()
+
+    def add(self, triple):
+        self._pending[triple] = None
+
+        if len(self._pending) >= self.batchsize:
+            self.flush()
+
+    def set(self, triple):
+        self.add(triple)
+
+    def remove(self, triple):
+        pass
+
+    def flush(self):
+        """Add the buffered triples to the graph."""
+        if self._pending:
+            g = self.graph
+            g.addN((s, p, o, g) for s, p, o in self._pending)
+            self._pending = dict()
+
+    def triples(self, pattern):
+        if None not in pattern:
+            if pattern in self:
+                yield pattern
+            return
+
+        self.flush()
+        yield from self.graph.triples(pattern)
+
+    def __contains__(self, triple):
+        return triple in self._pending or triple in self.graph
+
+    def __len__(self):
+        self.flush()
+        return len(self.graph)
+
+    def __getattr__(self, name):
+        self.flush()
+        return getattr(self.graph, name)
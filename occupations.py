@@ -0,0 +1,194 @@
+"""
+Fuzzy matching of occupation strings on the HISCO names, for the occupations
+that have no exact match in the lookup table (spelling variants, typos,
+compounds such as "koopman en winkelier").
+
+Fuzzy matching is opt-in (`main.py --fuzzy [THRESHOLD]`): a wrong match puts
+a wrong HISCO code in the data.
+"""
+
+import re
+import heapq
+import functools
+import itertools
+from collections import Counter, defaultdict
+
+# Minimal similarity of a fuzzy match. Trigram similarity hardly tells
+# apart compounds that differ in one letter (e.g. kastenmakersknecht and
+# kistenmakersknecht score 0.84), so the default only accepts close variants.
+THRESHOLD = 0.9
+
+# Conjunctions and separators between the occupations in a compound
+SEPARATORS = re.compile(
+    r"\s*(?:[,;/&+]|\b(?:en|of|c\.q\.|tevens|annex|alsmede)(?=\s|$))\s*")
+
+
+@functools.lru_cache(maxsize=2**16)
+def split(occupation):
+    """Split a compound occupation into its parts.
+
+    Args:
+        occupation (str): The normalized occupation
+
+    Returns:
+        tuple: The parts (one part if it is not a compound)
+    """
+    parts = tuple(part for part in SEPARATORS.split(occupation) if part)
+
+    return parts or (occupation, )
+
+
+def trigrams(value):
+    """The set of character trigrams of a string, padded so that the first
+    and last characters weigh in as well. Runs of whitespace count as one
+    space.
+
+    Args:
+        value (str): The string
+
+    Returns:
+        set: Trigrams
+    """
+    value = "  " + " ".join(value.split()) + " "
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+class OccupationMatcher:
+    """Trigram inverted index over the occupation names in a lookup table
+    that have HISCO categories. A lookup only scores the names that share a
+    trigram with the query (Dice coefficient) and is memoized per string.
+
+    Args:
+        occupations2hisco (HiscoTable): The lookup table
+        threshold (float, optional): Minimal score of a match. Defaults to
+        THRESHOLD.
+        maxsize (int, optional): Maximum number of memoized lookups. Defaults
+        to 65536.
+    """
+
+    def __init__(self, occupations2hisco, threshold=THRESHOLD, maxsize=2**16):
+        self.occupations2hisco = occupations2hisco
+        self.threshold = threshold
+
+        self.names = []
+        self.sizes = []
+        self.index = defaultdict(list)
+
+        for name in occupations2hisco:
+            if not occupations2hisco.get(name):
+                continue
+
+            grams = trigrams(name)
+            for gram in grams:
+                self.index[gram].append(len(self.names))
+
+            self.names.append(name)
+            self.sizes.append(len(grams))
+
+        self.candidates = functools.lru_cache(maxsize=maxsize)(
+            self._candidates)
+        self.lookup = functools.lru_cache(maxsize=maxsize)(self._lookup)
+
+    def _candidates(self, occupation, limit=5):
+        """Ranked candidates for an occupation.
+
+        Args:
+            occupation (str): The normalized occupation
+            limit (int, optional): Maximum number of candidates. Defaults to
+            5.
+
+        Returns:
+            tuple: (name, score) tuples, best first
+        """
+        grams = trigrams(occupation)
+        size = len(grams)
+        sizes = self.sizes
+
+        shared = Counter(
+            itertools.chain.from_iterable(
+                self.index.get(gram, ()) for gram in grams))
+
+        best = heapq.nlargest(limit, ((2 * n / (size + sizes[i]), -i)
+                                      for i, n in shared.items()))
+
+        return tuple((self.names[-i], score) for score, i in best)
+
+    def match(self, occupation):
+        """The best candidate for an occupation, if it scores high enough.
+
+        Args:
+            occupation (str): The normalized occupation
+
+        Returns:
+            tuple: (name, score), or None if there is no match
+        """
+        candidates = self.candidates(occupation)
+
+        if candidates and candidates[0][1] >= self.threshold:
+            return candidates[0]
+
+    def resolve(self, occupation):
+        """The HISCO categories of a single occupation, on an exact match or
+        else on the best fuzzy match.
+
+        Args:
+            occupation (str): The normalized occupation
+
+        Returns:
+            tuple: The (code, category, name) tuples of the categories and
+            the confidence (1.0 for an exact match), or ((), None) if there
+            is no match
+        """
+        categories = self.occupations2hisco.get(occupation)
+        if categories:
+            return categories, 1.0
+
+        match = self.match(occupation)
+        if match is None:
+            return (), None
+
+        name, score = match
+        return self.occupations2hisco[name], score
+
+    def _lookup(self, occupation):
+        categories = self.occupations2hisco.get(occupation)
+        if categories:
+            return categories, 1.0
+
+        # A compound: every part is resolved on its own. The confidence is
+        # the mean over the parts, an unresolved part counts as 0.
+        parts = split(occupation)
+        if len(parts) > 1:
+            resolved = [self.resolve(part) for part in parts]
+
+            categories = tuple(
+                dict.fromkeys(c for cs, _ in resolved for c in cs))
+            if categories:
+                return categories, sum(score or 0.0
+                                       for _, score in resolved) / len(parts)
+
+        return self.resolve(occupation)
+
+    def __call__(self, occupation):
+        """The HISCO categories of an occupation, with the confidence of the
+        match (1.0 for an exact match). Memoized per string.
+
+        Args:
+            occupation (str): The normalized occupation
+
+        Returns:
+            tuple: The (code, category, name) tuples of the categories and
+            the confidence, or ((), None) if there is no match
+        """
+        return self.lookup(occupation)
+
+    def stats(self):
+        """Hits, misses and hit rate of the memo of the lookups.
+
+        Returns:
+            tuple: (hits, misses, hitrate)
+        """
+        info = self.lookup.cache_info()
+        calls = info.hits + info.misses
+
+        return info.hits, info.misses, info.hits / calls if calls else 0.0
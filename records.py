@@ -0,0 +1,262 @@
+"""
+Record level access to the SAA index exports.
+"""
+
+import re
+import json
+import mmap
+import hashlib
+import xml.etree.ElementTree as ET
+
+from collections.abc import Mapping
+
+RECORDTAG = 'indexRecord'
+
+
+class Record(Mapping):
+    """Read-only view on a parsed record that returns None for every field
+    that is not in the source (e.g. `beroep` or `huisnummertoevoeging`).
+
+    Nothing is copied: nested dictionaries are wrapped on access.
+
+    Args:
+        data (dict): A record in the xmltodict structure
+    """
+    __slots__ = ('_data', )
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getitem__(self, key):
+        value = self._data.get(key)
+
+        if type(value) == dict:
+            return Record(value)
+        elif type(value) == list and value and type(value[0]) == dict:
+            return [Record(i) if type(i) == dict else i for i in value]
+
+        return value
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"Record({self._data!r})"
+
+    def get(self, key, default=None):
+        return self[key] if key in self._data else default
+
+
+def localname(tag):
+    """Strip a namespace (ElementTree's `{uri}` notation) from a tag.
+
+    Args:
+        tag (str): The tag of an ElementTree element
+
+    Returns:
+        str: The tag without namespace
+    """
+    if tag[0] == '{':
+        return tag.rsplit('}', 1)[1]
+    return tag
+
+
+def element2dict(element):
+    """Convert an element to the structure xmltodict would have returned.
+
+    Attributes are prefixed with an '@', repeated children become a list,
+    text is stripped and empty elements become None.
+
+    Args:
+        element (Element): ElementTree element
+
+    Returns:
+        dict or str or None: The element's content
+    """
+    d = {f"@{localname(k)}": v for k, v in element.attrib.items()}
+
+    for child in element:
+        key = localname(child.tag)
+        value = element2dict(child)
+
+        if key in d:
+            if type(d[key]) == list:
+                d[key].append(value)
+            else:
+                d[key] = [d[key], value]
+        else:
+            d[key] = value
+
+    text = element.text.strip() if element.text else None
+
+    if not d:
+        return text or None
+    elif text:
+        d['#text'] = text
+
+    return d
+
+
+def iterrecords(xmlfile, tag=RECORDTAG):
+    """Iterate over the records of a SAA export one at a time.
+
+    Only the record that is currently yielded is kept in memory: every
+    element is cleared once it has been converted, so the memory use depends
+    on the size of one record and not on the size of the file.
+
+    Args:
+        xmlfile (str or file): Path to (or file object of) the xml file
+        tag (str, optional): The record element. Defaults to 'indexRecord'.
+
+    Yields:
+        Record: One record in the xmltodict structure
+    """
+    root = None
+
+    for event, element in ET.iterparse(xmlfile, events=('start', 'end')):
+
+        if event == 'start':
+            if root is None:
+                root = element
+            continue
+
+        if localname(element.tag) == tag:
+            yield Record(element2dict(element))
+
+            # Also drop the reference from the parent
+            root.clear()
+
+
+def recordhash(record):
+    """Content hash of a record, independent of the order of its fields.
+
+    Args:
+        record (Record): The record
+
+    Returns:
+        str: Hex digest
+    """
+    data = json.dumps(record._data, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def recordpattern(tag=RECORDTAG):
+    """Regular expression for the start tag of a record (in bytes)."""
+    return re.compile(rb'<' + tag.encode() + rb'[\s/>]')
+
+
+def recordbounds(mm, tag=RECORDTAG):
+    """Find the start of the first record and the end of the last record.
+
+    Args:
+        mm (mmap): The export
+        tag (str, optional): The record element. Defaults to 'indexRecord'.
+
+    Returns:
+        tuple: Byte offsets (first, end), or None if there are no records
+    """
+    first = recordpattern(tag).search(mm)
+    if first is None:
+        return None
+
+    closing = b'</' + tag.encode() + b'>'
+
+    return first.start(), mm.rfind(closing) + len(closing)
+
+
+def shard(xmlfile, n, tag=RECORDTAG):
+    """Split a SAA export into (at most) `n` byte ranges of about the same
+    size, each starting at a record. Only the bytes are scanned, nothing is
+    parsed.
+
+    Args:
+        xmlfile (str): Path to the xml file
+        n (int): Number of shards
+        tag (str, optional): The record element. Defaults to 'indexRecord'.
+
+    Returns:
+        list: (start, end) byte offsets per shard
+    """
+    pattern = recordpattern(tag)
+
+    with open(xmlfile, 'rb') as infile, mmap.mmap(
+            infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+
+        bounds = recordbounds(mm, tag)
+        if bounds is None:
+            return []
+
+        first, end = bounds
+
+        boundaries = [first]
+        for i in range(1, n):
+            match = pattern.search(mm, first + (end - first) * i // n)
+
+            if match is None or match.start() >= end:
+                break
+            elif match.start() > boundaries[-1]:
+                boundaries.append(match.start())
+
+        boundaries.append(end)
+
+    return list(zip(boundaries, boundaries[1:]))
+
+
+class ShardReader:
+    """File-like view on one shard of an export (see `shard`). The byte range
+    is wrapped in the prolog (xml declaration and root element) and epilog of
+    the file, so that it reads as a complete document.
+
+    Args:
+        xmlfile (str): Path to the xml file
+        start (int): Byte offset of the first record of the shard
+        end (int): Byte offset after the last record of the shard
+        tag (str, optional): The record element. Defaults to 'indexRecord'.
+    """
+
+    def __init__(self, xmlfile, start, end, tag=RECORDTAG):
+        self.file = open(xmlfile, 'rb')
+
+        with mmap.mmap(self.file.fileno(), 0,
+                       access=mmap.ACCESS_READ) as mm:
+            first, last = recordbounds(mm, tag)
+            size = len(mm)
+
+        # (offset, length) to read in order
+        self.segments = [(0, first), (start, end - start),
+                         (last, size - last)]
+
+    def read(self, size=-1):
+        chunks = []
+
+        while self.segments and size != 0:
+            offset, length = self.segments[0]
+            n = length if size < 0 else min(size, length)
+
+            self.file.seek(offset)
+            chunks.append(self.file.read(n))
+
+            if n == length:
+                self.segments.pop(0)
+            else:
+                self.segments[0] = (offset + n, length - n)
+
+            if size > 0:
+                size -= n
+
+        return b''.join(chunks)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -5486,14 +5486,43 @@ occupations = ["occupation",
 "was op doeker",
 "directiesecretaris"]
 
+import os
+import gzip
 import json
-from SPARQLWrapper import SPARQLWrapper, TURTLE, JSON
-from rdflib import Graph
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from SPARQLWrapper import SPARQLWrapper, JSON
+from rdflib import Graph, Literal, Namespace, RDF
+from rdflib.plugins.parsers.ntriples import W3CNTriplesParser
 
-def getHisco(occupation):
+from hiscotable import writeTable, DBFILE
 
-    print(f"Querying {occupation}")
+ENDPOINT = "https://api.druid.datalegend.net/datasets/iisg/HISCO/services/HISCO/sparql"
+JSONFILE = os.path.join(os.path.dirname(__file__), 'occupations2hisco.json')
+
+
+def quote(value):
+    """SPARQL string literal of a value."""
+    value = value.replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{value}"'
+
+
+def getHiscoBatch(occupations, endpoint=ENDPOINT):
+    """Look up the HISCO categories of a batch of occupations in one query,
+    with the occupations in a VALUES block.
+
+    Args:
+        occupations (list): Occupations in lower case
+        endpoint (str, optional): SPARQL endpoint with the HISCO data (e.g. a
+        local Oxigraph server). Defaults to ENDPOINT.
+
+    Returns:
+        dict: occupation: bindings (empty list if there is no match)
+    """
+
+    values = " ".join(quote(occupation) for occupation in occupations)
 
     q = f"""
     PREFIX schema: <http://schema.org/>
@@ -5501,6 +5530,8 @@ def getHisco(occupation):
     PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
 
     SELECT * WHERE {{
+    VALUES ?occupation {{ {values} }}
+
     ?hiscoOccupation a schema:Occupation ;
       schema:name ?occName ; 
       schema:occupationalCategory ?hiscoCategory .
@@ -5508,29 +5539,214 @@ def getHisco(occupation):
     ?hiscoCategory schema:codeValue ?hiscoCode ;
                    schema:name ?hiscoCategoryName .
     
-    FILTER ( LCASE(STR(?occName)) = "{occupation}" )
+    FILTER ( LCASE(STR(?occName)) = ?occupation )
     FILTER ( LANG(?occName) = 'nl')
     }}
     """
 
-    sparql = SPARQLWrapper(
-        "https://api.druid.datalegend.net/datasets/iisg/HISCO/services/HISCO/sparql"
-    )
+    sparql = SPARQLWrapper(endpoint)
     sparql.setQuery(q)
+    sparql.setMethod('POST')
 
     sparql.setReturnFormat(JSON)
     results = sparql.query().convert()
 
-    return results['results']['bindings']
+    d = {occupation: [] for occupation in occupations}
+    for r in results['results']['bindings']:
+        occupation = r.pop('occupation')['value']
+        d[occupation].append(r)
 
+    return d
 
-if __name__ == "__main__":
-    d = dict()
-    for occupation in occupations:
-        occupation = occupation.lower() 
-        results = getHisco(occupation)
 
-        d[occupation] = results
+def getHisco(occupation, endpoint=ENDPOINT):
+
+    return getHiscoBatch([occupation], endpoint)[occupation]
+
 
-    with open('occupations2hisco.json', 'w') as outfile:
+def loadCache(jsonfile=JSONFILE):
+    """The occupations that were harvested already.
+
+    Args:
+        jsonfile (str, optional): Defaults to JSONFILE.
+
+    Returns:
+        dict: occupation: bindings
+    """
+    if not os.path.exists(jsonfile):
+        return dict()
+
+    with open(jsonfile) as infile:
+        return json.load(infile)
+
+
+def saveCache(d, jsonfile=JSONFILE):
+    """Write the harvested occupations. The file is replaced atomically, so
+    that an interrupted run leaves a valid cache to resume from.
+
+    Args:
+        d (dict): occupation: bindings
+        jsonfile (str, optional): Defaults to JSONFILE.
+    """
+    tmpfile = jsonfile + '.tmp'
+    with open(tmpfile, 'w') as outfile:
         json.dump(d, outfile)
+
+    os.replace(tmpfile, jsonfile)
+
+
+def harvest(occupations,
+            jsonfile=JSONFILE,
+            endpoint=ENDPOINT,
+            batchsize=50,
+            workers=4):
+    """Harvest the HISCO categories of the occupations that are not in the
+    cache yet. Batches of occupations are queried concurrently and the cache
+    is saved after every batch.
+
+    Args:
+        occupations (list): Occupations (any case)
+        jsonfile (str, optional): The cache. Defaults to JSONFILE.
+        endpoint (str, optional): SPARQL endpoint. Defaults to ENDPOINT.
+        batchsize (int, optional): Occupations per query. Defaults to 50.
+        workers (int, optional): Concurrent queries. Defaults to 4.
+
+    Returns:
+        dict: occupation: bindings
+    """
+    d = loadCache(jsonfile)
+
+    todo = sorted({o.lower() for o in occupations} - d.keys())
+    batches = [
+        todo[i:i + batchsize] for i in range(0, len(todo), batchsize)
+    ]
+
+    print(f"{len(d)} occupations in cache, querying {len(todo)} "
+          f"in {len(batches)} batches")
+
+    with ThreadPoolExecutor(workers) as executor:
+        futures = {
+            executor.submit(getHiscoBatch, batch, endpoint): batch
+            for batch in batches
+        }
+
+        for n, future in enumerate(as_completed(futures), 1):
+            try:
+                d.update(future.result())
+            except Exception as e:
+                # Left out of the cache, so tried again on the next run
+                print(f"Batch {futures[future][0]!r}... failed: {e}")
+                continue
+
+            saveCache(d, jsonfile)
+            print(f"{n}/{len(batches)} batches")
+
+    return d
+
+
+schema = Namespace("http://schema.org/")
+
+
+class HiscoSink:
+    """Sink for the N-Triples parser that only keeps the triples of the
+    query in getHiscoBatch: the Dutch names and categories of the
+    occupations and the code and name of the categories.
+    """
+
+    def __init__(self):
+        self.occupations = set()
+        self.names = defaultdict(set)
+        self.categories = defaultdict(set)
+        self.codes = dict()
+        self.catnames = defaultdict(set)
+        self.length = 0
+
+    def triple(self, s, p, o):
+        self.length += 1
+
+        if p == RDF.type and o == schema.Occupation:
+            self.occupations.add(s)
+        elif p == schema.name and isinstance(o, Literal):
+            if o.language == 'nl':
+                self.names[s].add(str(o))
+            self.catnames[s].add(str(o))
+        elif p == schema.occupationalCategory:
+            self.categories[s].add(o)
+        elif p == schema.codeValue:
+            self.codes[s] = str(o)
+
+    def rows(self):
+        """Join the kept triples.
+
+        Yields:
+            tuple: (occupation, code, category, name), with the occupation in
+            lower case
+        """
+        for occupation in self.occupations:
+            for occName in self.names[occupation]:
+                for category in self.categories[occupation]:
+                    if category not in self.codes:
+                        continue
+
+                    for catname in self.catnames[category]:
+                        yield (occName.lower(), self.codes[category],
+                               str(category), catname)
+
+
+def dump2table(dumpfile, dbfile=DBFILE):
+    """Build the lookup table from a local HISCO dump, for all occupations at
+    once, instead of querying an endpoint.
+
+    N-Triples (.nt, .nt.gz) is streamed, only the triples that are needed are
+    kept. Other formats (e.g. Turtle) are parsed into a Graph first.
+
+    The table is marked as built from a dump, so that `hiscotable.load` does
+    not recompile it from occupations2hisco.json.
+
+    Args:
+        dumpfile (str): The HISCO dump
+        dbfile (str, optional): Destination. Defaults to DBFILE.
+    """
+    sink = HiscoSink()
+
+    if dumpfile.endswith(('.nt', '.nt.gz')):
+        opener = gzip.open if dumpfile.endswith('.gz') else open
+        with opener(dumpfile, 'rb') as infile:
+            W3CNTriplesParser(sink).parse(infile)
+    else:
+        g = Graph()
+        g.parse(dumpfile)
+        for triple in g:
+            sink.triple(*triple)
+
+    rows = set(sink.rows())
+    writeTable(sorted(rows), dbfile, source='dump')
+
+    print(f"{sink.length} triples, {len({r[0] for r in rows})} occupation "
+          f"names, {len(rows)} rows written to {dbfile}")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Harvest the HISCO categories of the occupations.")
+    parser.add_argument('--endpoint',
+                        default=ENDPOINT,
+                        help="SPARQL endpoint, e.g. a local Oxigraph server")
+    parser.add_argument('--output', default=JSONFILE, help="Cache (json)")
+    parser.add_argument('--batchsize', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument(
+        '--dump',
+        help="Build the lookup table from a local HISCO dump (N-Triples or "
+        "Turtle) instead of querying the endpoint")
+    parser.add_argument('--table',
+                        default=DBFILE,
+                        help="Lookup table (sqlite), with --dump")
+    args = parser.parse_args()
+
+    if args.dump:
+        dump2table(args.dump, args.table)
+    else:
+        harvest(occupations, args.output, args.endpoint, args.batchsize,
+                args.workers)
@@ -0,0 +1,184 @@
+"""
+Compact HISCO lookup table.
+
+Compiles the SPARQL result bindings in occupations2hisco.json (see
+gethisco.py) into an SQLite file with one row per (occupation, category):
+
+    occupation -> (hiscoCode, hiscoCategory, hiscoCategoryName)
+
+Opening the file costs next to nothing and every lookup is an index search,
+instead of decoding the whole JSON in every process.
+
+The table can also be built from a local HISCO dump, for all occupations at
+once (`python resources/gethisco.py --dump hisco.nt`). The table records
+where it was built from: `load` recompiles a table from the json when the
+json is newer, but never replaces a table that was built from a dump.
+
+Usage:
+    python resources/hiscotable.py [occupations2hisco.json] [occupations2hisco.sqlite]
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import tempfile
+
+JSONFILE = os.path.join(os.path.dirname(__file__), 'occupations2hisco.json')
+DBFILE = os.path.join(os.path.dirname(__file__), 'occupations2hisco.sqlite')
+
+
+def writeTable(rows, dbfile=DBFILE, source='json'):
+    """Write a lookup table. The file is replaced atomically, so that
+    processes that compile at the same time do not get in each other's way.
+
+    Args:
+        rows (iterable): (occupation, code, category, name) tuples. An
+        occupation without HISCO match is a row with code, category and name
+        None.
+        dbfile (str, optional): Destination. Defaults to DBFILE.
+        source (str, optional): What the table was built from: 'json' or
+        'dump'. Defaults to 'json'.
+    """
+    fd, tmpfile = tempfile.mkstemp(suffix='.sqlite',
+                                   dir=os.path.dirname(os.path.abspath(dbfile)))
+    os.close(fd)
+
+    con = sqlite3.connect(tmpfile)
+    con.execute("""CREATE TABLE hisco (
+        occupation TEXT NOT NULL,
+        code TEXT,
+        category TEXT,
+        name TEXT)""")
+    con.executemany("INSERT INTO hisco VALUES (?, ?, ?, ?)", rows)
+    con.execute("CREATE INDEX occupation_index ON hisco (occupation)")
+    con.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    con.execute("INSERT INTO meta VALUES ('source', ?)", (source, ))
+    con.commit()
+    con.close()
+
+    os.replace(tmpfile, dbfile)
+
+
+def json2table(jsonfile=JSONFILE, dbfile=DBFILE):
+    """Compile occupations2hisco.json into the lookup table.
+
+    Args:
+        jsonfile (str, optional): SPARQL bindings per occupation. Defaults to
+        JSONFILE.
+        dbfile (str, optional): Destination. Defaults to DBFILE.
+    """
+    with open(jsonfile) as infile:
+        occupations2hisco = json.load(infile)
+
+    rows = []
+    for occupation, bindings in occupations2hisco.items():
+        if bindings == []:
+            rows.append((occupation, None, None, None))
+
+        for r in bindings:
+            rows.append((occupation, r['hiscoCode']['value'],
+                         r['hiscoCategory']['value'],
+                         r['hiscoCategoryName']['value']))
+
+    writeTable(rows, dbfile, source='json')
+
+
+def tablesource(dbfile=DBFILE):
+    """What a lookup table was built from.
+
+    Args:
+        dbfile (str, optional): The table. Defaults to DBFILE.
+
+    Returns:
+        str: 'json' or 'dump'. Tables from before the source was recorded
+        were compiled from the json.
+    """
+    con = sqlite3.connect(f"file:{dbfile}?mode=ro", uri=True)
+    try:
+        row = con.execute(
+            "SELECT value FROM meta WHERE key = 'source'").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        con.close()
+
+    return row[0] if row is not None else 'json'
+
+
+class HiscoTable:
+    """Read-only access to a compiled lookup table.
+
+    Args:
+        dbfile (str, optional): The table. Defaults to DBFILE.
+    """
+
+    def __init__(self, dbfile=DBFILE):
+        self.dbfile = dbfile
+        self.con = sqlite3.connect(f"file:{dbfile}?mode=ro", uri=True)
+
+    def __getitem__(self, occupation):
+        """The HISCO categories of a (normalized) occupation.
+
+        Args:
+            occupation (str): The occupation in lower case
+
+        Raises:
+            KeyError: If the occupation is not in the table
+
+        Returns:
+            tuple: (code, category, name) per category
+        """
+        rows = self.con.execute(
+            "SELECT code, category, name FROM hisco WHERE occupation = ?",
+            (occupation, )).fetchall()
+
+        if not rows:
+            raise KeyError(occupation)
+
+        return tuple(row for row in rows if row[0] is not None)
+
+    def get(self, occupation, default=None):
+        try:
+            return self[occupation]
+        except KeyError:
+            return default
+
+    def __contains__(self, occupation):
+        return self.con.execute(
+            "SELECT 1 FROM hisco WHERE occupation = ? LIMIT 1",
+            (occupation, )).fetchone() is not None
+
+    def __iter__(self):
+        """The occupations in the table."""
+        for occupation, in self.con.execute(
+                "SELECT DISTINCT occupation FROM hisco"):
+            yield occupation
+
+    def close(self):
+        self.con.close()
+
+
+def load(jsonfile=JSONFILE, dbfile=DBFILE):
+    """Open the lookup table, (re)compiling it first if the json is newer.
+    A table that was built from a HISCO dump is used as it is.
+
+    Args:
+        jsonfile (str, optional): SPARQL bindings per occupation. Defaults to
+        JSONFILE.
+        dbfile (str, optional): The table. Defaults to DBFILE.
+
+    Returns:
+        HiscoTable: The lookup table
+    """
+    if not os.path.exists(dbfile) or (
+            os.path.exists(jsonfile)
+            and os.path.getmtime(jsonfile) > os.path.getmtime(dbfile)
+            and tablesource(dbfile) == 'json'):
+        json2table(jsonfile, dbfile)
+
+    return HiscoTable(dbfile)
+
+
+if __name__ == "__main__":
+    json2table(*sys.argv[1:3])
@@ -0,0 +1,138 @@
+"""
+Caches for the rdflib terms that the mapping creates over and over again.
+"""
+
+import sys
+import uuid
+import functools
+
+from rdflib import URIRef, Literal
+
+
+def uuidkey(value):
+    """The deterministic key of a shared resource (e.g. a place, an address
+    or an occupation): the uuid5 of its string.
+
+    Args:
+        value (str): The string from the source
+
+    Returns:
+        str: uuid5 in the OID namespace
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, value))
+
+
+class Minter:
+    """Mint the IRI of a shared resource in a namespace from its string,
+    with a bounded LRU cache in front of the hashing and the URIRef
+    construction.
+
+    Args:
+        namespace (Namespace): The namespace of the resources
+        maxsize (int, optional): Maximum number of cached IRIs. Defaults to
+        65536.
+    """
+
+    def __init__(self, namespace, maxsize=2**16):
+        self.namespace = namespace
+        self.mint = functools.lru_cache(maxsize=maxsize)(self._mint)
+
+    def _mint(self, value):
+        return self.namespace.term(uuidkey(value))
+
+    def __call__(self, value):
+        return self.mint(value)
+
+    def stats(self):
+        """Hits, misses and hit rate of the cache.
+
+        Returns:
+            tuple: (hits, misses, hitrate)
+        """
+        info = self.mint.cache_info()
+        calls = info.hits + info.misses
+
+        return info.hits, info.misses, info.hits / calls if calls else 0.0
+
+
+class TermCache:
+    """Intern the Literals and URIRefs that recur in many triples (the period
+    of a register, roles, neighbourhoods, HISCO categories, ...), so that
+    equal terms are one and the same object in the graph.
+
+    Args:
+        intern (bool, optional): Set to False to create a new term every
+        time (for comparison). Defaults to True.
+    """
+
+    def __init__(self, intern=True):
+        self.intern = intern
+
+        self.terms = dict()
+
+        self.hits = 0
+        self.saved = 0  # bytes
+
+    def _lookup(self, key):
+        term = self.terms.get(key)
+
+        if term is not None:
+            self.hits += 1
+            self.saved += sys.getsizeof(term)
+
+        return term
+
+    def literal(self, value, lang=None, datatype=None):
+        """Get the Literal for a value.
+
+        Args:
+            value (str): Lexical form
+            lang (str, optional): Language tag. Defaults to None.
+            datatype (URIRef, optional): Datatype. Defaults to None.
+
+        Returns:
+            Literal: The interned Literal
+        """
+        if not self.intern:
+            return Literal(value, lang=lang, datatype=datatype)
+
+        key = (value, lang, datatype)
+        term = self._lookup(key)
+
+        if term is None:
+            term = self.terms[key] = Literal(value,
+                                             lang=lang,
+                                             datatype=datatype)
+
+        return term
+
+    def uri(self, value):
+        """Get the URIRef for an IRI.
+
+        Args:
+            value (str): The IRI
+
+        Returns:
+            URIRef: The interned URIRef
+        """
+        if not self.intern:
+            return URIRef(value)
+
+        term = self._lookup(value)
+
+        if term is None:
+            term = self.terms[value] = URIRef(value)
+
+        return term
+
+    def stats(self):
+        """Number of interned terms, hits and the bytes saved by the hits.
+
+        Returns:
+            tuple: (terms, hits, saved)
+        """
+        return len(self.terms), self.hits, self.saved
+
+
+# Shared by the mapping code in a process
+TERMS = TermCache()
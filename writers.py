@@ -0,0 +1,281 @@
+"""
+Writers for the converted indices.
+"""
+
+import io
+import re
+import zlib
+import queue
+import functools
+import threading
+
+from rdflib import Dataset, Literal, URIRef, RDF
+from rdflib.plugins.serializers.nt import _quoteLiteral
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Local names that can be written as prefix:localname
+LOCALNAME = re.compile(r"[A-Za-z0-9_]([A-Za-z0-9_.-]*[A-Za-z0-9_-])?")
+
+# Compression: file extension
+COMPRESSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+
+def n3(term):
+    """N-Triples notation of a term.
+
+    Args:
+        term (Identifier): URIRef, BNode or Literal
+
+    Returns:
+        str: The term in N-Triples
+    """
+    if isinstance(term, Literal):
+        return _quoteLiteral(term)
+    return term.n3()
+
+
+class BackgroundCompressor(io.RawIOBase):
+    """Binary file that compresses what is written to it in a background
+    thread, so that compressing and writing overlap with the mapping (zlib
+    and zstandard release the GIL).
+
+    Args:
+        path (str): Destination file
+        compression (str): 'gzip' or 'zstd' (needs the zstandard package)
+        level (int, optional): Compression level. Defaults to None (the
+        default level of the compression).
+        queuesize (int, optional): Maximum number of chunks waiting to be
+        compressed. Defaults to 64.
+    """
+
+    def __init__(self, path, compression, level=None, queuesize=64):
+        if compression == 'gzip':
+            # wbits 31: a gzip member
+            self.compressor = zlib.compressobj(
+                level if level is not None else 6, zlib.DEFLATED, 31)
+        elif compression == 'zstd':
+            if zstandard is None:
+                raise ImportError("zstd output needs the zstandard package")
+            self.compressor = zstandard.ZstdCompressor(
+                level=level if level is not None else 3).compressobj()
+        else:
+            raise ValueError(f"Unknown compression: {compression}")
+
+        self.file = open(path, 'wb')
+        self.error = None
+
+        self.queue = queue.Queue(queuesize)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+
+            # After an error, keep emptying the queue so write() can't block
+            if self.error is None:
+                try:
+                    self.file.write(self.compressor.compress(chunk))
+                except Exception as e:
+                    self.error = e
+
+        try:
+            if self.error is None:
+                self.file.write(self.compressor.flush())
+        except Exception as e:
+            self.error = e
+        finally:
+            self.file.close()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        if self.error is not None:
+            raise self.error
+
+        self.queue.put(bytes(b))
+        return len(b)
+
+    def close(self):
+        if not self.closed:
+            self.queue.put(None)
+            self.thread.join()
+            super().close()
+
+            if self.error is not None:
+                raise self.error
+
+
+def openOutput(path):
+    """Open a destination file for writing text, compressed if the
+    extension asks for it (see COMPRESSIONS).
+
+    Args:
+        path (str): Destination file, e.g. index.nq or index.nq.gz
+
+    Returns:
+        TextIO: The file
+    """
+    for compression, extension in COMPRESSIONS.items():
+        if path.endswith(extension):
+            raw = BackgroundCompressor(path, compression)
+            return io.TextIOWrapper(io.BufferedWriter(raw, 2**20),
+                                    encoding='utf-8')
+
+    return open(path, 'w', encoding='utf-8')
+
+
+class NQuadsWriter:
+    """Write quads to a file while they are produced, instead of collecting
+    them in a Dataset first. Nothing is kept in memory.
+
+    Args:
+        path (str): Destination file (.nq, .nq.gz or .nq.zst)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = openOutput(path)
+
+    def write(self, triples, graph=None):
+        """Write triples to a named graph.
+
+        Args:
+            triples (iterable): (s, p, o) tuples
+            graph (URIRef, optional): The named graph. Defaults to None (the
+            default graph).
+        """
+        g = f" {graph.n3()}" if graph is not None else ""
+
+        self.file.writelines(f"{n3(s)} {n3(p)} {n3(o)}{g} .\n"
+                             for s, p, o in triples)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TriGWriter:
+    """Write TriG while the triples are produced, instead of serializing a
+    whole Dataset at the end. Every batch is grouped per subject (with `;`
+    and `,`) and IRIs are compacted with the prefixes. Consecutive batches
+    of the same graph go in one graph block.
+
+    A subject can appear in more than one batch, e.g. a shared location that
+    is documented in a later record again. That is still valid TriG.
+
+    Args:
+        path (str): Destination file (.trig, .trig.gz or .trig.zst)
+        prefixes (dict, optional): prefix: namespace to compact the IRIs
+        with. Defaults to None.
+    """
+
+    def __init__(self, path, prefixes=None):
+        self.path = path
+        self.file = openOutput(path)
+
+        self.namespaces = {
+            str(namespace): prefix
+            for prefix, namespace in (prefixes or {}).items()
+        }
+        for namespace, prefix in self.namespaces.items():
+            self.file.write(f"@prefix {prefix}: <{namespace}> .\n")
+        self.file.write("\n")
+
+        self.graph = None
+        self.opened = False
+
+        self.term = functools.lru_cache(maxsize=2**16)(self._term)
+
+    def _term(self, term):
+        """TriG notation of a term, compacted if possible."""
+        if isinstance(term, URIRef):
+            i = max(term.rfind('/'), term.rfind('#')) + 1
+            prefix = self.namespaces.get(term[:i])
+
+            if prefix is not None and LOCALNAME.fullmatch(term, i):
+                return f"{prefix}:{term[i:]}"
+            return term.n3()
+
+        if isinstance(term, Literal):
+            if term.datatype is not None:
+                return (_quoteLiteral(Literal(str(term))) + "^^" +
+                        self.term(term.datatype))
+            return _quoteLiteral(term)
+
+        return term.n3()
+
+    def write(self, triples, graph=None):
+        """Write triples to a named graph.
+
+        Args:
+            triples (iterable): (s, p, o) tuples
+            graph (URIRef, optional): The named graph. Defaults to None (the
+            default graph).
+        """
+        if not self.opened or graph != self.graph:
+            if self.opened:
+                self.file.write("}\n\n")
+
+            self.file.write(f"{self.term(graph)} {{\n" if graph is not None
+                            else "{\n")
+            self.graph = graph
+            self.opened = True
+
+        subjects = dict()
+        for s, p, o in triples:
+            subjects.setdefault(s, dict()).setdefault(p, []).append(o)
+
+        term = self.term
+        lines = []
+        for s, predicates in subjects.items():
+            statements = []
+            for p, objects in predicates.items():
+                p = 'a' if p == RDF.type else term(p)
+                statements.append(f"{p} {', '.join(map(term, objects))}")
+
+            lines.append(f"    {term(s)} " + " ;\n        ".join(statements) +
+                         " .\n")
+
+        self.file.writelines(lines)
+
+    def close(self):
+        if self.opened:
+            self.file.write("}\n")
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def nquads2trig(nqfile, trigfile, prefixes=None):
+    """Turn an N-Quads file into TriG, as a post-processing step.
+
+    Args:
+        nqfile (str): Path to the N-Quads file
+        trigfile (str): Destination path
+        prefixes (dict, optional): prefix: namespace to bind. Defaults to
+        None.
+    """
+    ds = Dataset()
+    ds.parse(nqfile, format='nquads')
+
+    for prefix, namespace in (prefixes or {}).items():
+        ds.bind(prefix, namespace)
+
+    ds.serialize(trigfile, format='trig')